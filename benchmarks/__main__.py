@@ -0,0 +1,27 @@
+import argparse
+
+from benchmarks.runner import run, compare
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for geometry, rendering and editing")
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help="Run the benchmarks and write the results as JSON")
+    run_parser.add_argument('-o', '--output', help="Output file, defaults to stdout")
+    run_parser.add_argument('-k', '--filter', help="Only run cases whose name contains this string")
+    run_parser.add_argument('-r', '--repeat', type=int, default=3, help="Repetitions per case, the fastest is reported")
+    compare_parser = subparsers.add_parser('compare', help="Compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help="Relative slowdown reported as regression")
+    args = parser.parse_args()
+    if args.command == 'compare':
+        compare(args)
+    else:
+        if args.command is None:
+            args = run_parser.parse_args([])
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
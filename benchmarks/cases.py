@@ -0,0 +1,189 @@
+import random
+
+import pygame
+
+import track_generator.config as config
+import track_generator.regulations as regulations
+from track_generator.generation.layout_search import generate_layouts
+from track_generator.generation.track_builder import generate_tracks
+from track_generator.track.tile_atlas import tile_atlases
+from track_generator.track.lane_markings import draw_dashed_polyline
+from track_generator.export.camera_renderer import CameraRenderer, iter_camera_poses
+from benchmarks.synthetic_tracks import synthetic_track, untwinned_chain
+
+# Every case gets its parameters and returns a function that performs the benchmarked
+# operations once and returns how many operations it performed
+
+track_sizes = [10, 100, 1000, 10000]
+chain_lengths = [10, 100, 1000]
+render_scales = [0.02, 0.1, 0.5]
+lane_marking_scales = [0.25, 1]
+layout_counts = [200]
+camera_batch_sizes = [1, 32]
+screen_size = (config.screen_width, config.screen_height)
+
+
+def render_cold(tile_count, scale):
+    # First frame without any cached tile surfaces
+    track = synthetic_track(tile_count)
+    screen = pygame.Surface(screen_size)
+
+    def run():
+        tile_atlases.clear()
+        track.render(screen, scale, (0, 0))
+        return 1
+    return run
+
+
+def render_generated(scale):
+    # First frame of a generated loop, the curves are drawn from their cached tessellation
+    track = generate_tracks(1, seed=0, processes=1)[0]
+    screen = pygame.Surface(screen_size)
+    tile_pixels = config.tile_size * scale
+    (min_x, min_y), _ = track.get_grid_bounds()
+    offset = (-min_x * tile_pixels, -min_y * tile_pixels)
+
+    def run():
+        tile_atlases.clear()
+        track.render(screen, scale, offset)
+        return 1
+    return run
+
+
+def render_warm(tile_count, scale):
+    # Frames where nothing changed
+    track = synthetic_track(tile_count)
+    screen = pygame.Surface(screen_size)
+    track.render(screen, scale, (0, 0))
+
+    def run():
+        for _ in range(10):
+            track.render(screen, scale, (0, 0))
+        return 10
+    return run
+
+
+def drag_connection_point(chain_length):
+    # Tilt a chain of twinned straight roads by dragging the free end of its last tile along the border
+    # The chain pivots as one line, so the drag distance shrinks with the length to stay within the tiles
+    track = synthetic_track(chain_length, row_length=chain_length)
+    road_element = track.tiles[-1].road_element
+    distance = config.tile_size / 4 / chain_length
+    positions = _drag_positions(lambda offset: (config.tile_size, config.tile_size / 2 + offset), distance)
+
+    def run():
+        for position in positions:
+            road_element.update_connection_point(1, position)
+        return len(positions)
+    return run
+
+
+def drag_guide_point(chain_length):
+    # Move the guide point in the middle of a chain, which moves both connection points
+    track = synthetic_track(chain_length, row_length=chain_length)
+    road_element = track.tiles[chain_length // 2].road_element
+    positions = _drag_positions(lambda offset: (config.tile_size / 2, config.tile_size / 2 + offset))
+
+    def run():
+        for position in positions:
+            road_element.update_guide_point(0, position)
+        return len(positions)
+    return run
+
+
+def set_twin_chain(chain_length):
+    # Twin a row of straight roads one after another, every new twin propagates along the chain
+    tracks = []
+
+    def run():
+        track = untwinned_chain(chain_length)
+        tracks.append(track)
+        for previous, tile in zip(track.tiles, track.tiles[1:]):
+            previous.road_element.connection_points[1].set_twin(tile.road_element.connection_points[0])
+        return chain_length - 1
+    return run
+
+
+def draw_lane_markings(scale):
+    # Dashed center lines of a generated loop without the rest of the tiles, placed like in render_generated
+    track = generate_tracks(1, seed=0, processes=1)[0]
+    track.update_lane_marking_phases()
+    screen = pygame.Surface(screen_size)
+    tile_pixels = config.tile_size * scale
+    (min_x, min_y), _ = track.get_grid_bounds()
+    offset = (-min_x * tile_pixels, -min_y * tile_pixels)
+    road_elements = [tile.road_element for tile in track.tiles]
+    centerlines = [road_element.get_centerline(scale) for road_element in road_elements]
+
+    def run():
+        for road_element, centerline in zip(road_elements, centerlines):
+            draw_dashed_polyline(screen, config.color_lane_marking, centerline, regulations.lane_marking_line_width,
+                                 phase=road_element.lane_marking_phase, scale=scale, offset=offset)
+        return len(road_elements)
+    return run
+
+
+def hit_test(tile_count):
+    # Hover and click over random screen positions
+    from track_generator.track_generator import TrackGenerator
+    track = synthetic_track(tile_count)
+    track_overlay = TrackGenerator(track).user_interface.track_overlay
+    generator = random.Random(0)
+    positions = [(generator.uniform(0, screen_size[0]), generator.uniform(0, screen_size[1])) for _ in range(1000)]
+    click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=pygame.BUTTON_LEFT)
+    release = pygame.event.Event(pygame.MOUSEBUTTONUP, button=pygame.BUTTON_LEFT)
+
+    def run():
+        for position in positions:
+            track_overlay.handle_mouse_motion(position)
+            track_overlay.handle_mouse_press(click, position)
+            track_overlay.handle_mouse_release(release, position)
+        return len(positions)
+    return run
+
+
+def generate_layouts_case(count):
+    # Candidate loops in a single process, cases already run in worker processes that can not start a pool
+    def run():
+        return len(generate_layouts(count, seed=0, processes=1))
+    return run
+
+
+def render_camera_images(batch_size):
+    # Synthetic camera views along a generated loop, seconds per operation is the time per image on one core
+    track = generate_tracks(1, seed=0, processes=1)[0]
+    renderer = CameraRenderer(track)
+    poses = next(iter_camera_poses(track))[:batch_size]
+
+    def run():
+        renderer.render(poses)
+        return len(poses)
+    return run
+
+
+def _drag_positions(position_from_offset, distance=400, steps=50):
+    # Move back and forth like a mouse drag
+    offsets = [distance * (index / steps) for index in range(steps)]
+    return [position_from_offset(offset) for offset in offsets + offsets[::-1]]
+
+
+def all_cases():
+    cases = []
+    for tile_count in track_sizes:
+        for scale in render_scales:
+            cases.append(("render_cold", render_cold, {"tile_count": tile_count, "scale": scale}))
+            cases.append(("render_warm", render_warm, {"tile_count": tile_count, "scale": scale}))
+        cases.append(("hit_test", hit_test, {"tile_count": tile_count}))
+    for scale in render_scales:
+        cases.append(("render_generated", render_generated, {"scale": scale}))
+    for scale in lane_marking_scales:
+        cases.append(("draw_lane_markings", draw_lane_markings, {"scale": scale}))
+    for chain_length in chain_lengths:
+        cases.append(("drag_connection_point", drag_connection_point, {"chain_length": chain_length}))
+        cases.append(("drag_guide_point", drag_guide_point, {"chain_length": chain_length}))
+        cases.append(("set_twin_chain", set_twin_chain, {"chain_length": chain_length}))
+    for count in layout_counts:
+        cases.append(("generate_layouts", generate_layouts_case, {"count": count}))
+    for batch_size in camera_batch_sizes:
+        cases.append(("render_camera_images", render_camera_images, {"batch_size": batch_size}))
+    return cases
@@ -0,0 +1,92 @@
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+# Run without a display, this has to happen before pygame creates any window
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+
+def run_case(name, params, repeat):
+    import pygame
+    from benchmarks.cases import all_cases
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    case = next(function for case_name, function, case_params in all_cases() if case_name == name and case_params == params)
+    result = {"name": name, "params": params}
+    tracemalloc.start()
+    try:
+        run = case(**params)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            operations = run()
+            timings.append((time.perf_counter() - start) / operations)
+        result["seconds_per_operation"] = min(timings)
+        result["mean_seconds_per_operation"] = sum(timings) / len(timings)
+    except Exception as error:
+        result["error"] = f"{type(error).__name__}: {error}"[:200]
+    result["peak_python_memory"] = tracemalloc.get_traced_memory()[1]
+    result["max_rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    tracemalloc.stop()
+    pygame.quit()
+    return result
+
+
+def run(args):
+    from benchmarks.cases import all_cases
+
+    results = []
+    # Every case runs in a fresh process so memory measurements do not influence each other
+    context = multiprocessing.get_context('spawn')
+    for name, _, params in all_cases():
+        if args.filter and args.filter not in name:
+            continue
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, (name, params, args.repeat))
+        results.append(result)
+        print(_format_result(result), file=sys.stderr)
+
+    output = {"python": platform.python_version(), "platform": platform.platform(), "results": results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(output, file, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+
+
+def compare(args):
+    # Compare two runs and report cases that became slower than the threshold
+    with open(args.baseline) as file:
+        baseline = {_key(result): result for result in json.load(file)["results"]}
+    with open(args.current) as file:
+        current = json.load(file)["results"]
+    regressions = 0
+    for result in current:
+        old = baseline.get(_key(result))
+        if not old or "seconds_per_operation" not in old or "seconds_per_operation" not in result:
+            continue
+        ratio = result["seconds_per_operation"] / old["seconds_per_operation"]
+        marker = ""
+        if ratio > 1 + args.threshold:
+            marker = "  REGRESSION"
+            regressions += 1
+        print(f"{result['name']:<24} {json.dumps(result['params']):<40} {ratio:6.2f}x{marker}")
+    sys.exit(1 if regressions else 0)
+
+
+def _key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def _format_result(result):
+    if "error" in result:
+        return f"{result['name']:<24} {json.dumps(result['params']):<40} {result['error']}"
+    return (f"{result['name']:<24} {json.dumps(result['params']):<40} {result['seconds_per_operation'] * 1e3:10.3f} ms/op"
+            f" {result['peak_python_memory'] / 2 ** 20:8.1f} MiB")
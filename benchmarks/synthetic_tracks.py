@@ -0,0 +1,29 @@
+import math
+
+import track_generator.config as config
+from track_generator.track.serialization import file_format, file_version, track_from_dict
+
+
+def synthetic_track(tile_count, row_length=None, twinned=True):
+    # Rows of horizontal straight roads, the tiles of every row form one chain of twins
+    if row_length is None:
+        row_length = max(1, math.ceil(math.sqrt(tile_count)))
+    center = config.tile_size / 2
+    road_element = {
+        "type": "straight_road",
+        "guide_points": [{"position": [center, center], "direction": [1, 0]}],
+        "connection_points": [{"position": [0, center], "direction": [-1, 0]},
+                              {"position": [config.tile_size, center], "direction": [1, 0]}],
+    }
+    tiles = []
+    twins = []
+    for index in range(tile_count):
+        tiles.append({"grid_position": [index % row_length, index // row_length], "road_element": road_element})
+        if twinned and index % row_length != 0:
+            twins.append([[index - 1, 1], [index, 0]])
+    return track_from_dict({"format": file_format, "version": file_version, "tile_size": config.tile_size, "tiles": tiles, "twins": twins})
+
+
+def untwinned_chain(length):
+    # A single row of straight roads that still have to be twinned
+    return synthetic_track(length, row_length=length, twinned=False)
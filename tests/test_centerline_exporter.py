@@ -0,0 +1,56 @@
+import numpy
+
+from benchmarks.synthetic_tracks import synthetic_track
+from track_generator.export.centerline_exporter import iter_centerline
+from track_generator.generation.layout_search import Layout
+from track_generator.generation.track_builder import layout_to_track
+
+
+def _get_rows(track) -> numpy.ndarray:
+    # Chains may be exported in another order, they are numbered by the position of their first sample instead
+    rows = numpy.concatenate(list(iter_centerline(track, 100, 1000)))
+    starts = {chain: tuple(rows[rows[:, 0] == chain][0, 2:4]) for chain in numpy.unique(rows[:, 0])}
+    order = {chain: index for index, chain in enumerate(sorted(starts, key=starts.get))}
+    rows[:, 0] = [order[chain] for chain in rows[:, 0]]
+    return rows[numpy.lexsort((rows[:, 1], rows[:, 0]))]
+
+
+def test_paged_track_is_exported_in_place():
+    expected = _get_rows(synthetic_track(2000))
+    track = synthetic_track(2000)
+    track.enable_paging()
+    track.update_paging((0, 0), (10, 10))
+    paged_out = sorted(track.pager.get_chunk_positions())
+    loaded_tiles = len(track.tiles)
+    rows = _get_rows(track)
+    numpy.testing.assert_allclose(rows, expected)
+    # The chunks that were paged out are paged out again
+    assert sorted(track.pager.get_chunk_positions()) == paged_out
+    assert len(track.tiles) == loaded_tiles
+    track.load_all_chunks()
+    assert track.validate() == []
+
+
+def test_paged_loop_is_exported_without_loading_it():
+    # Ring of 188 tiles around a 48 x 48 area, its chunks form a ring as well
+    size = 48
+    ring = ([(x, 0) for x in range(size)] + [(size - 1, y) for y in range(1, size)]
+            + [(x, size - 1) for x in range(size - 2, -1, -1)] + [(0, y) for y in range(size - 2, 0, -1)])
+    expected_row_count = len(numpy.concatenate(list(iter_centerline(layout_to_track(Layout(ring)), 100, 1000))))
+    track = layout_to_track(Layout(ring))
+    track.enable_paging()
+    track.update_paging((0, 0), (1, 1))
+    paged_out = sorted(track.pager.get_chunk_positions())
+    loaded_chunk_counts = []
+    page_in = track.pager.page_in
+
+    def count_and_page_in(chunk_position):
+        loaded_chunk_counts.append(len(track.get_chunk_positions()) - len(track.pager))
+        return page_in(chunk_position)
+
+    track.pager.page_in = count_and_page_in
+    rows = numpy.concatenate(list(iter_centerline(track, 100, 1000)))
+    assert len(rows) == expected_row_count
+    # The loaded chunks at the corner and the chunks the loop passes through one after another
+    assert max(loaded_chunk_counts) <= len(track.get_chunk_positions()) - len(paged_out) + 1
+    assert sorted(track.pager.get_chunk_positions()) == paged_out
@@ -0,0 +1,42 @@
+from benchmarks.synthetic_tracks import synthetic_track
+from track_generator.track.points import ConnectionPoint
+from track_generator.exceptions import InvalidTrackError
+
+
+def _get_unlinked_points(track) -> list:
+    return [point for tile in track.tiles for point in tile.road_element.connection_points if track.pager.is_unlinked(point)]
+
+
+def test_paging_keeps_twins():
+    track = synthetic_track(2000)
+    track.enable_paging()
+    track.update_paging((0, 0), (10, 10))
+    assert len(track.pager) > 0
+    assert _get_unlinked_points(track)
+    track.load_all_chunks()
+    assert len(track.pager) == 0
+    assert _get_unlinked_points(track) == []
+    assert track.validate() == []
+
+
+def test_failed_link_is_kept_and_reported(monkeypatch):
+    track = synthetic_track(2000)
+    track.enable_paging()
+    track.update_paging((0, 0), (10, 10))
+
+    def fail_set_twin(point, twin):
+        raise InvalidTrackError("Twin does not fit", point)
+
+    monkeypatch.setattr(ConnectionPoint, "set_twin", fail_set_twin)
+    track.load_all_chunks()
+    errors = track.validate()
+    assert errors
+    # One error for both points of a link
+    assert len(_get_unlinked_points(track)) == 2 * len(errors)
+
+    # The links are tried again once a chunk of theirs is paged in again
+    monkeypatch.undo()
+    track.update_paging((0, 0), (10, 10))
+    track.load_all_chunks()
+    assert _get_unlinked_points(track) == []
+    assert track.validate() == []
@@ -0,0 +1,85 @@
+import pytest
+
+from benchmarks.synthetic_tracks import synthetic_track
+from track_generator.generation.track_builder import generate_tracks
+from track_generator.track.vector import Vector2
+from track_generator.exceptions import InvalidTrackError
+
+
+def _get_points(track) -> list:
+    return [(tuple(point.position), tuple(point.direction)) for tile in track.tiles for point in tile.road_element.connection_points]
+
+
+def _get_points_by_tile(track) -> dict:
+    return {tile.grid_position: [(tuple(point.position), tuple(point.direction)) for point in tile.road_element.connection_points] for tile in track.tiles}
+
+
+def _get_straight_road(track):
+    return next(tile.road_element for tile in track.tiles if tile.road_element.type_name == "straight_road")
+
+
+def test_undo_and_redo_drag_on_loop():
+    track = generate_tracks(1, seed=0, processes=1)[0]
+    road_element = _get_straight_road(track)
+    guide_point = road_element.guide_points[0]
+    original = _get_points(track)
+    # All moves of a drag become one step
+    with track.history.group():
+        for offset in (Vector2(20, 30), Vector2(40, 60), Vector2(60, 90)):
+            road_element.update_guide_point(0, guide_point.position + offset)
+    dragged = _get_points(track)
+    assert dragged != original
+    assert track.validate() == []
+
+    assert track.history.undo()
+    assert _get_points(track) == original
+    assert track.validate() == []
+    assert track.history.redo()
+    assert _get_points(track) == dragged
+    assert track.validate() == []
+    assert not track.history.redo()
+
+
+def test_invalid_redo_is_set_back():
+    track = generate_tracks(1, seed=0, processes=1)[0]
+    road_element = _get_straight_road(track)
+    original = _get_points(track)
+    # A state with a connection point off the border is recorded like any other
+    state = road_element.get_state()
+    position, direction, border = state.connection_points[0]
+    state.connection_points[0] = (position - 60 * direction, direction, border)
+    road_element.set_state(state)
+    assert track.validate() != []
+
+    assert track.history.undo()
+    assert track.validate() == []
+    with pytest.raises(InvalidTrackError):
+        track.history.redo()
+    assert _get_points(track) == original
+    assert track.validate() == []
+    # The step is kept
+    assert track.history.can_redo()
+
+
+def test_undo_after_page_in():
+    # The twins of a paged out chunk are moved when it is linked again, undo moves them back
+    track = synthetic_track(64, row_length=64)
+    original = _get_points_by_tile(track)
+    track.enable_paging()
+    track.update_paging((0, 0), (1, 1))
+    tile = max(track.tiles, key=lambda tile: tile.x)
+    road_element = tile.road_element
+    road_element.update_guide_point(0, road_element.guide_points[0].position + Vector2(0, 200))
+    track.load_all_chunks()
+    dragged = _get_points_by_tile(track)
+    assert dragged != original
+    assert track.validate() == []
+
+    assert track.history.undo()
+    assert track.validate() == []
+    assert _get_points_by_tile(track) == original
+    assert track.history.redo()
+    assert track.validate() == []
+    assert _get_points_by_tile(track) == dragged
+    assert track.history.undo()
+    assert _get_points_by_tile(track) == original
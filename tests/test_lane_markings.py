@@ -0,0 +1,24 @@
+from benchmarks.synthetic_tracks import synthetic_track
+from track_generator.track.lane_markings import update_lane_marking_phases
+from track_generator.track.road_elements.straight_road import StraightRoad
+from track_generator.track.vector import Vector2
+
+
+def test_drag_only_walks_the_changed_chain(monkeypatch):
+    # Two rows of three twinned straight roads, every row is a chain of its own
+    track = synthetic_track(6, row_length=3)
+    track.update_lane_marking_phases()
+    road_element = track.tiles[0].road_element
+    point = road_element.connection_points[0]
+    road_element.update_connection_point(0, point.position + Vector2(0, 100))
+    walked = []
+    get_length = StraightRoad.get_length
+    monkeypatch.setattr(StraightRoad, "get_length", lambda self: walked.append(self) or get_length(self))
+    track.update_lane_marking_phases()
+    assert {road_element.tile.y for road_element in walked} == {0}
+    assert len(walked) == 3
+    # Nothing is left to update once the changed chain has been walked
+    assert update_lane_marking_phases(tile.road_element for tile in track.tiles) == []
+    walked.clear()
+    track.update_lane_marking_phases()
+    assert walked == []
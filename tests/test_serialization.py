@@ -0,0 +1,19 @@
+import pytest
+
+from benchmarks.synthetic_tracks import synthetic_track
+from track_generator.track.serialization import track_to_bytes, track_from_bytes
+from track_generator.exceptions import InvalidTrackError
+
+
+def test_binary_roundtrip():
+    track = synthetic_track(100)
+    loaded = track_from_bytes(track_to_bytes(track))
+    assert len(loaded.tiles) == len(track.tiles)
+    assert loaded.validate() == []
+
+
+def test_unknown_binary_type_name():
+    # Same length as the original name, so the rest of the file stays readable
+    data = track_to_bytes(synthetic_track(10)).replace(b"straight_road", b"unknown_roads")
+    with pytest.raises(InvalidTrackError, match="unknown_roads"):
+        track_from_bytes(data)
@@ -0,0 +1,51 @@
+import pytest
+
+from track_generator.generation.track_builder import generate_tracks
+from track_generator.track.road_element import RoadElementState
+from track_generator.track.vector import Vector2
+from track_generator.exceptions import InvalidPositionError, TrackGeneratorError
+
+
+def _get_points(track) -> list:
+    return [(tuple(point.position), tuple(point.direction)) for tile in track.tiles for point in tile.road_element.connection_points]
+
+
+def _move_along_border(point, distance) -> Vector2:
+    return point.position + (Vector2(0, distance) if point.get_border_code() % 2 == 0 else Vector2(distance, 0))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("distance", [-60, 60, 200])
+def test_drag_on_loop_keeps_twins_matching(seed, distance):
+    track = generate_tracks(1, seed=seed, processes=1)[0]
+    road_element = track.tiles[0].road_element
+    points = _get_points(track)
+    try:
+        road_element.update_connection_point(0, _move_along_border(road_element.connection_points[0], distance))
+    except TrackGeneratorError:
+        assert _get_points(track) == points
+    assert track.validate() == []
+
+
+def test_mismatch_on_loop_is_rejected(monkeypatch):
+    # The last twin pair of a loop is only compared, a road element that solves differently from both sides is rejected
+    track = generate_tracks(1, seed=0, processes=1)[0]
+    road_element = track.tiles[0].road_element
+    point = road_element.connection_points[0]
+    last_element = point.twin._road_element
+    solve_connection_point = last_element.solve_connection_point
+
+    def solve_shifted(index, position, direction=None):
+        # Moves the opposite connection point 20 mm further along its border than the geometry requires
+        state = solve_connection_point(index, position, direction)
+        connection_points = list(state.connection_points)
+        other_position, other_direction, border = connection_points[1 - index]
+        connection_points[1 - index] = (other_position + (Vector2(0, 20) if border % 2 == 0 else Vector2(20, 0)), other_direction, border)
+        return RoadElementState(state.guide_points, connection_points)
+
+    monkeypatch.setattr(last_element, "solve_connection_point", solve_shifted)
+    points = _get_points(track)
+    with pytest.raises(InvalidPositionError):
+        road_element.update_connection_point(0, _move_along_border(point, 60), point.direction)
+    assert _get_points(track) == points
+    assert track.validate() == []
@@ -1,2 +1,9 @@
-from .track_generator import TrackGenerator
 from .track.track import Track
+
+
+def __getattr__(name):
+    # The editor needs pygame and a display, it is only imported when it is actually used
+    if name == "TrackGenerator":
+        from .track_generator import TrackGenerator
+        return TrackGenerator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
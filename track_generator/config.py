@@ -16,6 +16,63 @@ color_connection_point_twin = (30, 30, 220)
 color_guide_point = (80, 200, 30)
 color_selected_point = (255, 200, 0)
 
+# Tile rendering
+tile_atlas_cache_size = 4               # Number of scales kept in texture atlases
+tile_atlas_page_size = 2048             # px, maximum width and height of an atlas surface
+tile_atlas_pixels = 16000000            # Pixels of rendered tiles kept per scale, exceeded if more distinct tiles are visible
+centerline_tolerance = 0.25             # px, maximum distance of tessellated curves from the exact curve
+centerline_max_segments = 256           # Maximum number of segments of a tessellated curve
+
+# Centerline export
+centerline_export_spacing = 50          # mm, arc length between two samples
+centerline_export_chunk_size = 4096     # Samples per exported array
+
+# Raster export
+raster_cell_size = 5                    # mm, width and height of a cell
+raster_distance_range = 500             # mm, distances to the centerline are clamped to this range
+
+# Sparse world
+chunk_size = 16                         # tiles, width and height of the chunks a track is stored in
+chunk_paging = True                     # Page chunks away from the view out to a temporary file while editing
+chunk_paging_margin = 1                 # chunks, kept loaded around the visible area
+chunk_surface_max_size = 1024           # px, chunks are only rendered as a whole up to this size
+chunk_cache_budget = 64000000           # bytes, memory of rendered chunks, least recently used ones are evicted
+
+# Synthetic camera images
+camera_image_size = (320, 240)          # px
+camera_horizontal_fov = 100             # degrees
+camera_height = 150                     # mm above the ground
+camera_pitch = 20                       # degrees below the horizon
+camera_texture_resolution = 5           # mm per pixel of the top-down texture the views are warped from
+camera_pose_spacing = 100               # mm along the centerline between two images
+camera_lateral_jitter = 100             # mm, random offset from the center of the right lane
+camera_yaw_jitter = 10                  # degrees, random rotation away from the direction of the road
+camera_batch_size = 4                   # Images warped at once, larger batches fall out of the CPU caches
+color_camera_sky = (170, 200, 230)
+
+# Procedural generation
+generator_grid_size = (10, 8)           # tiles, area the loops are generated in
+generator_min_tiles = 8                 # Minimum length of a loop in tiles
+generator_max_tiles = 40                # Maximum length of a loop in tiles
+generator_straight_bias = 0.6           # Probability to try continuing straight before turning
+generator_max_steps = 2000              # Search steps per attempt before starting over
+generator_max_attempts = 20             # Attempts per seed before giving up
+
+# Frame rate
+redraw_on_demand = True                 # Only redraw when the view changed and sleep while idle
+fps_limit = 60                          # Frame rate cap while the view is changing, e.g. during drags
+idle_event_timeout = 1000               # ms, maximum time to wait for an event while idle
+
+# Profiler, toggled with F3, F4 writes a trace while it is enabled
+profiler_history_size = 240             # Frames shown in the frame time graph
+profiler_graph_size = (480, 120)        # px
+profiler_graph_max_time = 50            # ms, frame time at the top of the graph
+profiler_slowest_tiles = 5              # Number of slowest tile draws listed
+profiler_trace_path = "frame_trace.jsonl"  # One JSON object per frame
+
+# Edit history
+history_size = 10000                    # Undo steps kept, a step only stores the points it changed
+
 # UI interaction
 pan_speed = 20                          # px per tick
 
@@ -1,6 +1,3 @@
-from operator import pos
-
-
 class TrackGeneratorError(Exception):
     """Base class for exeptions in this module."""
 
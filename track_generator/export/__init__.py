@@ -0,0 +1,4 @@
+from .image_exporter import init_headless, export_image, export_tiles, export_thumbnail, export_images
+from .centerline_exporter import iter_centerline, export_centerline
+from .raster_exporter import Raster, export_raster, load_raster
+from .camera_renderer import CameraRenderer, iter_camera_poses, export_camera_images
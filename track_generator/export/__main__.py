@@ -0,0 +1,49 @@
+import argparse
+import os
+
+from track_generator.export.image_exporter import init_headless, export_image, export_tiles, export_thumbnail, export_images
+from track_generator.export.centerline_exporter import export_centerline
+from track_generator.export.raster_exporter import export_raster
+from track_generator.export.camera_renderer import export_camera_images
+from track_generator.track.serialization import load_track
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render track files to PNG images without a display, or export their geometry")
+    parser.add_argument('tracks', nargs='+', help="Track files (.json or binary)")
+    parser.add_argument('-o', '--output', default='.', help="Output directory")
+    parser.add_argument('--mm-per-pixel', type=float, default=1, help="Resolution of the exported images")
+    parser.add_argument('--tiles', action='store_true', help="Export one image per tile instead of one image per track")
+    parser.add_argument('--thumbnail', type=int, metavar='SIZE', help="Export a preview image with the given maximum size")
+    parser.add_argument('--centerline', type=float, metavar='SPACING', help="Export the centerline and lane boundaries sampled every SPACING mm as CSV")
+    parser.add_argument('--raster', type=float, metavar='CELL_SIZE', help="Export drivable area, lane marking and distance layers with CELL_SIZE mm cells as .npy files")
+    parser.add_argument('--camera', action='store_true', help="Export synthetic camera images with lane marking labels along the centerline")
+    parser.add_argument('-j', '--processes', type=int, help="Number of worker processes")
+    args = parser.parse_args()
+
+    init_headless()
+    os.makedirs(args.output, exist_ok=True)
+    names = [os.path.splitext(os.path.basename(path))[0] for path in args.tracks]
+    if args.centerline:
+        for name, path in zip(names, args.tracks):
+            export_centerline(load_track(path), os.path.join(args.output, f"{name}.csv"), args.centerline)
+    elif args.camera:
+        for name, path in zip(names, args.tracks):
+            images_per_second = export_camera_images(load_track(path), os.path.join(args.output, name), processes=args.processes)
+            print(f"{name}: {images_per_second:.1f} images per second and process")
+    elif args.raster:
+        for name, path in zip(names, args.tracks):
+            export_raster(load_track(path), os.path.join(args.output, name), args.raster)
+    elif args.tiles:
+        for name, path in zip(names, args.tracks):
+            export_tiles(load_track(path), os.path.join(args.output, name), args.mm_per_pixel)
+    elif args.thumbnail:
+        for name, path in zip(names, args.tracks):
+            export_thumbnail(load_track(path), os.path.join(args.output, f"{name}.png"), args.thumbnail)
+    else:
+        export_images([(load_track(path), os.path.join(args.output, f"{name}.png"), args.mm_per_pixel)
+                       for name, path in zip(names, args.tracks)], args.processes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+import track_generator.config as config
+import track_generator.regulations as regulations
+from track_generator.track.track import Track
+from track_generator.export.centerline_exporter import iter_centerline
+from track_generator.export.image_exporter import init_headless, render_track
+from track_generator.export.png_writer import PngWriter
+
+
+class CameraRenderer:
+    """Views of a front camera on a model car, warped from a top-down texture of the track.
+
+    The texture is rendered once. Pixels of a view are mapped onto the ground by a homography,
+    combined with the pose and the texture scale into one 3x3 matrix per view, so all views
+    of a batch are warped by one matrix product and one lookup.
+    """
+
+    def __init__(self, track: Track, mm_per_pixel=config.camera_texture_resolution):
+        import pygame
+        surface = render_track(track, mm_per_pixel)
+        # (rows, columns, 3) with a border of background pixels for the ground outside of the track
+        # The lane markings are the only pixels drawn in their color
+        texture = pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+        self.texture = numpy.empty((texture.shape[0] + 2, texture.shape[1] + 2, 3), dtype=numpy.uint8)
+        self.texture[:] = config.color_track_background
+        self.texture[1:-1, 1:-1] = texture
+        self.labels = (self.texture == config.color_lane_marking).all(axis=2).astype(numpy.uint8)
+        # Flat lookup tables with the sky as an extra last entry
+        self._colors = numpy.concatenate((self.texture.reshape(-1, 3), [config.color_camera_sky])).astype(numpy.uint8)
+        self._label_values = numpy.concatenate((self.labels.ravel(), [0])).astype(numpy.uint8)
+        (min_x, min_y), _ = track.get_grid_bounds()
+        # Ground position in mm to texture pixel, including the border
+        self._texture_transform = numpy.array([[1 / mm_per_pixel, 0, 1 - min_x * config.tile_size / mm_per_pixel],
+                                               [0, 1 / mm_per_pixel, 1 - min_y * config.tile_size / mm_per_pixel],
+                                               [0, 0, 1]])
+        width, height = config.camera_image_size
+        columns, rows = numpy.meshgrid(numpy.arange(width) + 0.5, numpy.arange(height) + 0.5)
+        self._pixels = numpy.stack((columns.ravel(), rows.ravel(), numpy.ones(width * height))).astype(numpy.float32)
+        self._camera_homography = _get_camera_homography()
+
+    def render(self, poses) -> tuple:
+        # Images (poses, height, width, 3) and lane marking labels (poses, height, width) for (x, y, heading) poses
+        poses = numpy.asarray(poses, dtype=float).reshape(-1, 3)
+        cos, sin = numpy.cos(poses[:, 2]), numpy.sin(poses[:, 2])
+        # Ground relative to the car (forward, left) to ground in mm, the y axis points down
+        pose_transforms = numpy.zeros((len(poses), 3, 3))
+        pose_transforms[:, 0] = numpy.stack((cos, sin, poses[:, 0]), axis=1)
+        pose_transforms[:, 1] = numpy.stack((sin, -cos, poses[:, 1]), axis=1)
+        pose_transforms[:, 2, 2] = 1
+        homographies = (self._texture_transform @ pose_transforms @ self._camera_homography).astype(numpy.float32)
+        points = homographies @ self._pixels
+
+        # Texture pixel of every view pixel, the ground outside of the texture is clamped to its border
+        texture_height, texture_width = self.labels.shape
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            weights = 1 / points[:, 2]
+            columns = numpy.clip(points[:, 0] * weights, 0, texture_width - 1).astype(numpy.intp)
+            rows = numpy.clip(points[:, 1] * weights, 0, texture_height - 1).astype(numpy.intp)
+        indices = rows * texture_width + columns
+        # Pixels above the horizon do not hit the ground
+        indices[points[:, 2] <= 0] = len(self._colors) - 1
+        width, height = config.camera_image_size
+        return self._colors[indices].reshape(len(poses), height, width, 3), self._label_values[indices].reshape(len(poses), height, width)
+
+
+def iter_camera_poses(track: Track, spacing=config.camera_pose_spacing, seed=0):
+    # Arrays of (x, y, heading) poses in the right lane, jittered randomly, heading in radians with the y axis pointing down
+    rng = numpy.random.default_rng(seed)
+    for chunk in iter_centerline(track, spacing):
+        centers = chunk[:, 2:4]
+        left_normals = (chunk[:, 4:6] - centers) / regulations.lane_width
+        lateral_offsets = -regulations.lane_width / 2 + rng.uniform(-1, 1, len(chunk)) * config.camera_lateral_jitter
+        headings = numpy.arctan2(left_normals[:, 0], -left_normals[:, 1]) + numpy.radians(rng.uniform(-1, 1, len(chunk)) * config.camera_yaw_jitter)
+        yield numpy.column_stack((centers + lateral_offsets[:, None] * left_normals, headings))
+
+
+def export_camera_images(track: Track, directory, seed=0, processes=None) -> float:
+    # Writes <index>.png, <index>_label.png and poses.csv, the poses are split between the worker processes
+    # Returns the throughput in images per second and process, without building the texture
+    os.makedirs(directory, exist_ok=True)
+    pose_count = 0
+    with open(os.path.join(directory, "poses.csv"), 'w') as file:
+        file.write("index,x,y,heading\n")
+        for poses in iter_camera_poses(track, seed=seed):
+            numpy.savetxt(file, numpy.column_stack((numpy.arange(pose_count, pose_count + len(poses)), poses)), fmt=["%d", "%.3f", "%.3f", "%.6f"], delimiter=",")
+            pose_count += len(poses)
+    processes = processes or os.cpu_count()
+    ranges = [(pose_count * index // processes, pose_count * (index + 1) // processes) for index in range(processes)]
+    with ProcessPoolExecutor(processes, initializer=init_headless) as executor:
+        futures = [executor.submit(_export_pose_range, track, directory, seed, first, stop) for first, stop in ranges if stop > first]
+        results = [future.result() for future in futures]
+    seconds = sum(seconds for _, seconds in results)
+    return sum(count for count, _ in results) / seconds if seconds else 0
+
+
+def _export_pose_range(track, directory, seed, first, stop) -> tuple:
+    # Runs in a worker process, returns the number of images and the time spent rendering and writing them
+    renderer = CameraRenderer(track)
+    start_time = time.perf_counter()
+    width, height = config.camera_image_size
+    for index, poses in _iter_pose_batches(track, seed, first, stop):
+        images, labels = renderer.render(poses)
+        for offset, (image, label) in enumerate(zip(images, labels)):
+            name = os.path.join(directory, f"{index + offset:06d}")
+            with PngWriter(f"{name}.png", width, height) as writer:
+                writer.write_rows(image.tobytes())
+            with PngWriter(f"{name}_label.png", width, height, grayscale=True) as writer:
+                writer.write_rows((label * 255).tobytes())
+    return stop - first, time.perf_counter() - start_time
+
+
+def _iter_pose_batches(track, seed, first, stop):
+    # (index of the first pose, poses) batches of the poses from first to stop, every worker draws the same random poses
+    batch_size = config.camera_batch_size
+    index = 0
+    for poses in iter_camera_poses(track, seed=seed):
+        chunk_first = index
+        index += len(poses)
+        selected = poses[max(0, first - chunk_first):max(0, stop - chunk_first)]
+        for offset in range(0, len(selected), batch_size):
+            yield max(first, chunk_first) + offset, selected[offset:offset + batch_size]
+        if index >= stop:
+            return
+
+
+def _get_camera_homography() -> numpy.ndarray:
+    # Pixel (column, row, 1) to the point on the ground it shows, (forward, left, 1) in mm relative to the car, up to scale
+    # The weight is negative for pixels above the horizon
+    width, height = config.camera_image_size
+    focal_length = width / 2 / math.tan(math.radians(config.camera_horizontal_fov) / 2)
+    center_x, center_y = width / 2, height / 2
+    pitch = math.radians(config.camera_pitch)
+    camera_height = config.camera_height
+    return numpy.array([[0, -camera_height * math.sin(pitch) / focal_length, camera_height * (math.cos(pitch) + math.sin(pitch) * center_y / focal_length)],
+                        [-camera_height / focal_length, 0, camera_height * center_x / focal_length],
+                        [0, math.cos(pitch) / focal_length, math.sin(pitch) - math.cos(pitch) * center_y / focal_length]])
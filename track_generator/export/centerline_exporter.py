@@ -0,0 +1,174 @@
+import numpy
+
+import track_generator.config as config
+import track_generator.regulations as regulations
+from track_generator.track.track import Track
+from track_generator.track.chunk import get_chunk_position
+from track_generator.track.lane_markings import find_chain_start
+
+# Columns of the exported arrays, all coordinates in mm relative to the origin of the track
+# The left boundary is on the left in driving direction, with the y axis pointing down as on the screen
+columns = ("chain", "s", "x", "y", "left_x", "left_y", "right_x", "right_y")
+
+
+def iter_centerline(track: Track, spacing=config.centerline_export_spacing, chunk_size=config.centerline_export_chunk_size):
+    # Arrays of up to chunk_size rows with the columns above, sampled every spacing mm of arc length along every chain
+    # Paged out chunks of the track are loaded as the chains reach them and paged out again when a chain leaves them
+    # with all of their road elements exported, so only the chunks of the current chains and one output chunk are
+    # held in memory besides the loaded chunks
+    walker = _ChainWalker(track)
+    buffer = numpy.empty((chunk_size, len(columns)))
+    row_count = 0
+    chain_index = 0
+    for chunk_position in track.get_chunk_positions():
+        # Chunks can be exported completely by the chains of earlier chunks
+        if walker.remaining.get(chunk_position) == 0:
+            continue
+        chunk = track.get_chunk(chunk_position)
+        for grid_position in list(chunk.tiles) if chunk is not None else []:
+            # The tile is looked up again, a chain may have paged the chunk out in between
+            tile = track.get_tile(grid_position)
+            if tile.road_element is None or grid_position in walker.visited:
+                continue
+            for rows in _iter_chain_rows(walker, tile.road_element, chain_index, spacing):
+                # Copy the samples into the buffer and hand it out whenever it is full
+                while len(rows):
+                    count = min(chunk_size - row_count, len(rows))
+                    buffer[row_count:row_count + count] = rows[:count]
+                    row_count += count
+                    rows = rows[count:]
+                    if row_count == chunk_size:
+                        yield buffer.copy()
+                        row_count = 0
+            chain_index += 1
+        walker.leave(chunk_position)
+    # Everything is exported, chunks where a chain stopped early are paged out as well
+    track.page_out_chunks(list(walker.paged_out))
+    if row_count:
+        yield buffer[:row_count].copy()
+
+
+class _ChainWalker:
+    # Walks the chains of twinned road elements of a track through paged out chunks, see iter_centerline
+    # Exported road elements are kept by grid position, which stays valid when chunks are paged
+
+    def __init__(self, track):
+        self.track = track
+        self.paged_out = set(track.pager.get_chunk_positions()) if track.pager is not None else set()
+        self.visited = set()
+        # Chunk position to the number of road elements that are not exported yet
+        self.remaining = {}
+
+    def iter_chain(self, road_element):
+        # (road element, entry index) in driving order like lane_markings.iter_chain
+        # A closed loop starts at the road element and ends when the walk is back at it, it is never walked backwards
+        start, entry_index = find_chain_start(road_element)
+        if self.track.pager is not None and self._continues_paged_out(start, entry_index):
+            # Whether the chain is a loop is only known once a walk forward is back at the road element or at an open end
+            grid_position = road_element.tile.grid_position
+            is_loop, _ = self._walk_to_end(road_element, 0)
+            if is_loop:
+                start, entry_index = self.track.get_tile(grid_position).road_element, 0
+            else:
+                _, (start_position, backward_entry_index) = self._walk_to_end(self.track.get_tile(grid_position).road_element, 1)
+                start, entry_index = self.track.get_tile(start_position).road_element, 1 - backward_entry_index
+        return self._walk(start, entry_index)
+
+    def visit(self, road_element) -> bool:
+        # Mark the road element as exported, False if it already is
+        grid_position = road_element.tile.grid_position
+        if grid_position in self.visited:
+            return False
+        self.visited.add(grid_position)
+        chunk_position = get_chunk_position(grid_position)
+        if chunk_position not in self.remaining:
+            self.remaining[chunk_position] = sum(tile.road_element is not None for tile in self.track.get_chunk(chunk_position).tiles.values())
+        self.remaining[chunk_position] -= 1
+        return True
+
+    def leave(self, chunk_position) -> None:
+        # Page the chunk out again if it was paged out before the export, unless it has road elements left to export
+        if chunk_position in self.paged_out and self.remaining.get(chunk_position, 0) == 0:
+            self.track.page_out_chunks([chunk_position])
+
+    def _continues_paged_out(self, road_element, entry_index) -> bool:
+        # Whether the chain continues behind the entry of the road element in a paged out chunk
+        points = road_element.connection_points
+        return len(points) == 2 and points[entry_index].twin is None and self.track.pager.get_link(points[entry_index]) is not None
+
+    def _walk(self, road_element, entry_index):
+        # (road element, entry index) from the road element away from its entry, the chunks left behind are left
+        # Returns whether the walk ended back at the road element
+        grid_position = road_element.tile.grid_position
+        while True:
+            yield road_element, entry_index
+            chunk_position = get_chunk_position(road_element.tile.grid_position)
+            twin = self.track.get_twin(road_element.connection_points[1 - entry_index]) if len(road_element.connection_points) == 2 else None
+            if twin is None:
+                self.leave(chunk_position)
+                return False
+            road_element, entry_index = twin._road_element, twin._get_index()
+            if get_chunk_position(road_element.tile.grid_position) != chunk_position:
+                self.leave(chunk_position)
+            # Road elements are compared by grid position, paging creates new objects
+            if road_element.tile.grid_position == grid_position:
+                return True
+
+    def _walk_to_end(self, road_element, entry_index) -> tuple:
+        # Whether the walk closed a loop and the (grid position, entry index) of the last road element
+        walk = self._walk(road_element, entry_index)
+        last = None
+        while True:
+            try:
+                road_element, entry_index = next(walk)
+            except StopIteration as stop:
+                return stop.value, last
+            last = road_element.tile.grid_position, entry_index
+
+
+def _iter_chain_rows(walker, road_element, chain_index, spacing):
+    # Rows of every road element of the chain, the road elements are marked as exported
+    arc_length = 0
+    for road_element, entry_index in walker.iter_chain(road_element):
+        if not walker.visit(road_element):
+            break
+        rows, length = _sample_road_element(road_element, entry_index, arc_length, spacing)
+        rows[:, 0] = chain_index
+        arc_length += length
+        yield rows
+
+
+def export_centerline(track: Track, path, spacing=config.centerline_export_spacing) -> None:
+    # Comma separated values with a header line, written chunk by chunk
+    with open(path, 'w') as file:
+        file.write(",".join(columns) + "\n")
+        for chunk in iter_centerline(track, spacing):
+            numpy.savetxt(file, chunk, fmt=["%d"] + ["%.3f"] * (len(columns) - 1), delimiter=",")
+
+
+def _sample_road_element(road_element, entry_index, arc_length, spacing) -> tuple:
+    # Rows for the samples within the road element and the length of its centerline
+    # arc_length is the arc length of the chain at the start of the road element
+    points = road_element.get_centerline()
+    if entry_index == 1:
+        points = points[::-1]
+    points = points + numpy.asarray(road_element.tile.grid_position, dtype=float) * config.tile_size
+    vectors = numpy.diff(points, axis=0)
+    lengths = numpy.linalg.norm(vectors, axis=1)
+    points, vectors, lengths = points[:-1][lengths > 0], vectors[lengths > 0], lengths[lengths > 0]
+    if not len(lengths):
+        return numpy.empty((0, len(columns))), 0
+    ends = numpy.cumsum(lengths)
+    # Samples at multiples of the spacing along the chain, the end of a road element is the start of the next one
+    first = -arc_length % spacing
+    distances = numpy.arange(first, ends[-1] - 1e-9, spacing) if ends[-1] > first else numpy.empty(0)
+    segments = numpy.minimum(numpy.searchsorted(ends, distances, side='right'), len(lengths) - 1)
+    directions = vectors[segments] / lengths[segments, None]
+    centers = points[segments] + directions * (distances - (ends[segments] - lengths[segments]))[:, None]
+    left_normals = numpy.stack((directions[:, 1], -directions[:, 0]), axis=1)
+    rows = numpy.empty((len(distances), len(columns)))
+    rows[:, 1] = arc_length + distances
+    rows[:, 2:4] = centers
+    rows[:, 4:6] = centers + regulations.lane_width * left_normals
+    rows[:, 6:8] = centers - regulations.lane_width * left_normals
+    return rows, ends[-1]
@@ -0,0 +1,101 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+import track_generator.config as config
+from track_generator.track.track import Track
+from track_generator.export.png_writer import PngWriter
+
+
+def init_headless() -> None:
+    # Render without a window, e.g. on a server or in worker processes
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+
+
+def export_image(track: Track, path, mm_per_pixel=1, strip_height=None) -> None:
+    # The image is rendered and written in horizontal strips, by default one tile row per strip
+    scale = 1 / mm_per_pixel
+    tile_pixels = config.tile_size * scale
+    (min_x, min_y), (max_x, max_y) = track.get_grid_bounds()
+    width = max(1, math.ceil((max_x - min_x) * tile_pixels))
+    height = max(1, math.ceil((max_y - min_y) * tile_pixels))
+    if strip_height is None:
+        strip_height = math.ceil(tile_pixels)
+
+    track.update_lane_marking_phases()
+    strip = pygame.Surface((width, strip_height))
+    with PngWriter(path, width, height) as writer:
+        for strip_top in range(0, height, strip_height):
+            rows = min(strip_height, height - strip_top)
+            strip_rect = pygame.Rect(0, 0, width, rows)
+            _render_area(track, strip, strip_rect, scale, (-min_x * tile_pixels, -min_y * tile_pixels - strip_top))
+            writer.write_rows(pygame.image.tobytes(strip.subsurface(strip_rect), 'RGB'))
+
+
+def render_track(track: Track, mm_per_pixel=1) -> pygame.Surface:
+    # Whole track on one surface, the top left corner is the top left corner of the grid bounds
+    scale = 1 / mm_per_pixel
+    tile_pixels = config.tile_size * scale
+    (min_x, min_y), (max_x, max_y) = track.get_grid_bounds()
+    surface = pygame.Surface((max(1, math.ceil((max_x - min_x) * tile_pixels)), max(1, math.ceil((max_y - min_y) * tile_pixels))))
+    track.update_lane_marking_phases()
+    _render_area(track, surface, surface.get_rect(), scale, (-min_x * tile_pixels, -min_y * tile_pixels))
+    return surface
+
+
+def export_tiles(track: Track, directory, mm_per_pixel=1) -> list:
+    # One image per tile, e.g. for printing floor mats
+    os.makedirs(directory, exist_ok=True)
+    scale = 1 / mm_per_pixel
+    size = math.ceil(config.tile_size * scale)
+    surface = pygame.Surface((size, size))
+    track.update_lane_marking_phases()
+    paths = []
+    for tile in track.tiles:
+        _render_tile(tile, surface, surface.get_rect(), scale)
+        path = os.path.join(directory, f"tile_{tile.x}_{tile.y}.png")
+        pygame.image.save(surface, path)
+        paths.append(path)
+    return paths
+
+
+def export_thumbnail(track: Track, path, max_size=256) -> None:
+    (min_x, min_y), (max_x, max_y) = track.get_grid_bounds()
+    track_size = config.tile_size * max(max_x - min_x, max_y - min_y, 1)
+    export_image(track, path, track_size / max_size)
+
+
+def export_images(jobs, processes=None) -> None:
+    # Export several tracks in parallel, jobs are (track, path, mm_per_pixel) tuples
+    with ProcessPoolExecutor(processes, initializer=init_headless) as executor:
+        for future in [executor.submit(export_image, *job) for job in jobs]:
+            future.result()
+
+
+def _render_area(track: Track, surface, area, scale, offset) -> None:
+    # Render all tiles intersecting the area of the surface, offset is the pixel position of the track origin
+    surface.set_clip(area)
+    surface.fill(config.color_track_background, area)
+    tile_pixels = config.tile_size * scale
+    min_grid_position = (math.floor((area.left - offset[0]) / tile_pixels), math.floor((area.top - offset[1]) / tile_pixels))
+    max_grid_position = (math.ceil((area.right - offset[0]) / tile_pixels), math.ceil((area.bottom - offset[1]) / tile_pixels))
+    for tile in track.get_tiles_in_area(min_grid_position, max_grid_position):
+        left = round(offset[0] + tile.x * tile_pixels)
+        top = round(offset[1] + tile.y * tile_pixels)
+        right = round(offset[0] + (tile.x + 1) * tile_pixels)
+        bottom = round(offset[1] + (tile.y + 1) * tile_pixels)
+        _render_tile(tile, surface, pygame.Rect(left, top, right - left, bottom - top).clip(area), scale, (left, top))
+    surface.set_clip(None)
+
+
+def _render_tile(tile, surface, tile_rect, scale, origin=(0, 0)) -> None:
+    # Draw the road element directly at the export resolution, clipped to the tile
+    clip = surface.get_clip()
+    surface.set_clip(tile_rect)
+    surface.fill(config.color_road, tile_rect)
+    if tile.road_element:
+        tile.road_element.render(surface, scale, origin)
+    surface.set_clip(clip)
@@ -0,0 +1,54 @@
+import struct
+import zlib
+
+
+class PngWriter:
+    """Writes an 8 bit RGB or grayscale PNG row by row, so the image never has to be held in memory."""
+
+    def __init__(self, path, width, height, grayscale=False):
+        self.width = width
+        self.height = height
+        self.channels = 1 if grayscale else 3
+        self._rows_written = 0
+        self._compressor = zlib.compressobj()
+        self._file = open(path, 'wb')
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0 if grayscale else 2, 0, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def write_rows(self, data: bytes):
+        # data contains complete RGB or grayscale rows without filter bytes
+        stride = self.channels * self.width
+        row_count = len(data) // stride
+        if row_count * stride != len(data):
+            raise ValueError("Data does not contain complete rows")
+        if self._rows_written + row_count > self.height:
+            raise ValueError("Too many rows written to PNG")
+        filtered = b''.join(b'\x00' + data[i * stride:(i + 1) * stride] for i in range(row_count))
+        self._write_idat(self._compressor.compress(filtered))
+        self._rows_written += row_count
+
+    def close(self):
+        if self._rows_written != self.height:
+            raise ValueError(f"PNG expects {self.height} rows, but {self._rows_written} were written")
+        self._write_idat(self._compressor.flush())
+        self._write_chunk(b'IEND', b'')
+        self._file.close()
+
+    def _write_idat(self, data):
+        if data:
+            self._write_chunk(b'IDAT', data)
+
+    def _write_chunk(self, chunk_type, data):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
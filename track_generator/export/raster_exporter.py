@@ -0,0 +1,145 @@
+import json
+import math
+import os
+
+import numpy
+
+import track_generator.config as config
+import track_generator.regulations as regulations
+from track_generator.track.track import Track
+from track_generator.track.lane_markings import iter_chain
+
+# Layers of a raster, one .npy file each, indexed by [row, column] with rows along the y axis
+# drivable: road surface including the outer lines, lane_markings: outer lines and center dashes
+# distance: distance to the nearest centerline in mm, positive on the left in driving direction,
+# clamped to config.raster_distance_range
+layer_types = {"drivable": numpy.bool_, "lane_markings": numpy.bool_, "distance": numpy.float32}
+
+
+class Raster:
+    """Layers of a rasterized track, memory mapped from the files written by export_raster."""
+
+    def __init__(self, origin, cell_size, layers):
+        self.origin = origin            # Position of the top left corner of the first cell in mm
+        self.cell_size = cell_size      # mm
+        self.layers = layers            # Layer name to (rows, columns) array
+
+    def __repr__(self):
+        return f"Raster of {self.shape} cells of {self.cell_size:g} mm at {self.origin}"
+
+    @property
+    def shape(self) -> tuple:
+        return next(iter(self.layers.values())).shape
+
+    def get_cell(self, position) -> tuple:
+        # (row, column) of the cell containing the position in mm
+        return (math.floor((position[1] - self.origin[1]) / self.cell_size), math.floor((position[0] - self.origin[0]) / self.cell_size))
+
+
+def export_raster(track: Track, directory, cell_size=config.raster_cell_size) -> Raster:
+    # The layers are written straight to memory mapped files, one tile at a time
+    os.makedirs(directory, exist_ok=True)
+    track.update_lane_marking_phases()
+    (min_x, min_y), (max_x, max_y) = track.get_grid_bounds()
+    origin = (min_x * config.tile_size, min_y * config.tile_size)
+    shape = (max(1, math.ceil((max_y - min_y) * config.tile_size / cell_size)), max(1, math.ceil((max_x - min_x) * config.tile_size / cell_size)))
+    layers = {name: numpy.lib.format.open_memmap(os.path.join(directory, f"{name}.npy"), mode='w+', dtype=dtype, shape=shape)
+              for name, dtype in layer_types.items()}
+    with open(os.path.join(directory, "raster.json"), 'w') as file:
+        json.dump({"origin": origin, "cell_size": cell_size, "layers": list(layers)}, file, indent=2)
+
+    orientations = _get_orientations(track)
+    for grid_y in range(min_y, max_y):
+        for grid_x in range(min_x, max_x):
+            # Cells with their center inside of the tile
+            rows = _get_cell_range(grid_y * config.tile_size - origin[1], cell_size, shape[0])
+            columns = _get_cell_range(grid_x * config.tile_size - origin[0], cell_size, shape[1])
+            if len(rows) and len(columns):
+                blocks = _rasterize_block(track, (grid_x, grid_y), origin, cell_size, rows, columns, orientations)
+                for name, block in blocks.items():
+                    layers[name][rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1] = block
+    for layer in layers.values():
+        layer.flush()
+    return Raster(origin, cell_size, layers)
+
+
+def load_raster(directory, mode='r') -> Raster:
+    # The layers are memory mapped, nothing is read until the cells are accessed
+    with open(os.path.join(directory, "raster.json")) as file:
+        metadata = json.load(file)
+    layers = {name: numpy.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in metadata["layers"]}
+    return Raster(tuple(metadata["origin"]), metadata["cell_size"], layers)
+
+
+def _get_orientations(track) -> dict:
+    # Entry index of every road element in the driving direction of its chain, see lane_markings.iter_chain
+    orientations = {}
+    for tile in track.tiles:
+        if tile.road_element is not None and id(tile.road_element) not in orientations:
+            for road_element, entry_index in iter_chain(tile.road_element):
+                if id(road_element) in orientations:
+                    break
+                orientations[id(road_element)] = entry_index
+    return orientations
+
+
+def _get_cell_range(start, cell_size, cell_count) -> numpy.ndarray:
+    # Indices of the cells with their center between start and start + tile size
+    first = max(0, math.ceil(start / cell_size - 0.5))
+    end = min(cell_count, math.ceil((start + config.tile_size) / cell_size - 0.5))
+    return numpy.arange(first, end)
+
+
+def _rasterize_block(track, grid_position, origin, cell_size, rows, columns, orientations) -> dict:
+    # Layers of the cells of one tile, the centerlines of the neighbouring tiles are included for the distance field
+    distance_range = config.raster_distance_range
+    xs = origin[0] + (columns + 0.5) * cell_size
+    ys = origin[1] + (rows + 0.5) * cell_size
+    distances = numpy.full((len(rows), len(columns)), float(distance_range))
+    signs = numpy.ones_like(distances)
+    # Position in the dash pattern of the nearest point on the centerline
+    dash_positions = numpy.zeros_like(distances)
+
+    for neighbour_y in range(grid_position[1] - 1, grid_position[1] + 2):
+        for neighbour_x in range(grid_position[0] - 1, grid_position[0] + 2):
+            tile = track.get_tile((neighbour_x, neighbour_y))
+            if tile is None or tile.road_element is None:
+                continue
+            road_element = tile.road_element
+            points = road_element.get_centerline(1 / cell_size) + numpy.asarray(tile.grid_position, dtype=float) * config.tile_size
+            vectors = numpy.diff(points, axis=0)
+            lengths = numpy.linalg.norm(vectors, axis=1)
+            starts = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1])) + road_element.lane_marking_phase
+            # The dash pattern follows the order of the points, the sign follows the driving direction
+            sign = -1 if orientations.get(id(road_element)) == 1 else 1
+            for start, vector, length, arc_length in zip(points, vectors, lengths, starts):
+                if length == 0:
+                    continue
+                # Only cells within the distance range of the segment can get closer
+                end = start + vector
+                column_slice = _get_slice(xs, min(start[0], end[0]) - distance_range, max(start[0], end[0]) + distance_range)
+                row_slice = _get_slice(ys, min(start[1], end[1]) - distance_range, max(start[1], end[1]) + distance_range)
+                if column_slice.start >= column_slice.stop or row_slice.start >= row_slice.stop:
+                    continue
+                direction = vector / length
+                relative_x = xs[None, column_slice] - start[0]
+                relative_y = ys[row_slice, None] - start[1]
+                along = numpy.clip(relative_x * direction[0] + relative_y * direction[1], 0, length)
+                across = relative_x * direction[1] - relative_y * direction[0]
+                distance = numpy.hypot(relative_x - along * direction[0], relative_y - along * direction[1])
+                closer = distance < distances[row_slice, column_slice]
+                distances[row_slice, column_slice][closer] = distance[closer]
+                signs[row_slice, column_slice][closer] = numpy.where(across[closer] * sign >= 0, 1, -1)
+                dash_positions[row_slice, column_slice][closer] = (along + arc_length)[closer]
+
+    line_width = regulations.lane_marking_line_width
+    road_width = regulations.lane_width + line_width
+    period = 2 * regulations.lane_marking_dash_length
+    dashes = (distances <= line_width / 2) & (dash_positions % period < period / 2)
+    outer_lines = (distances > regulations.lane_width) & (distances <= road_width)
+    return {"drivable": distances <= road_width, "lane_markings": dashes | outer_lines, "distance": distances * signs}
+
+
+def _get_slice(centers, low, high) -> slice:
+    # Cells of the sorted cell centers between low and high
+    return slice(int(numpy.searchsorted(centers, low)), int(numpy.searchsorted(centers, high, side='right')))
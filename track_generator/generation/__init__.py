@@ -0,0 +1,2 @@
+from .layout_search import Layout, generate_layout, generate_layouts
+from .track_builder import road_element_builders, layout_to_track_data, layout_to_track, generate_tracks
@@ -0,0 +1,133 @@
+import functools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import track_generator.config as config
+
+# Grid steps indexed by border code, same order as geometry.border_vectors
+_steps = ((-1, 0), (0, -1), (1, 0), (0, 1))  # Left, top, right, bottom
+
+
+class Layout:
+    """Closed loop of tiles on the grid in driving order, the last tile is adjacent to the first one."""
+
+    def __init__(self, grid_positions, seed=None):
+        self.grid_positions = grid_positions
+        # Seed the layout was generated from, see generate_layout
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.grid_positions)
+
+    def __repr__(self):
+        return f"Layout with {len(self)} tiles and {self.count_turns()} turns from seed {self.seed!r}"
+
+    def get_borders(self) -> list:
+        # (entry, exit) border code of every tile, the entry is opposite to the exit of the previous tile
+        next_positions = self.grid_positions[1:] + self.grid_positions[:1]
+        exits = [_steps.index((b[0] - a[0], b[1] - a[1])) for a, b in zip(self.grid_positions, next_positions)]
+        entries = [(exit_border + 2) % 4 for exit_border in exits[-1:] + exits[:-1]]
+        return list(zip(entries, exits))
+
+    def count_turns(self) -> int:
+        return sum(1 for entry, exit_border in self.get_borders() if (entry + 2) % 4 != exit_border)
+
+
+def generate_layout(seed, grid_size=None, min_tiles=None, max_tiles=None, straight_bias=None):
+    # Random closed loop, the same seed and options always give the same layout
+    # Returns None if no loop was found within the configured number of attempts
+    grid_size = grid_size or config.generator_grid_size
+    min_tiles = min_tiles or config.generator_min_tiles
+    max_tiles = max_tiles or config.generator_max_tiles
+    straight_bias = config.generator_straight_bias if straight_bias is None else straight_bias
+    rng = random.Random(seed)
+    for _ in range(config.generator_max_attempts):
+        start = (rng.randrange(grid_size[0]), rng.randrange(grid_size[1]))
+        grid_positions = _search_loop(rng, start, grid_size, min_tiles, max_tiles, straight_bias)
+        if grid_positions:
+            return Layout(grid_positions, seed)
+    return None
+
+
+def generate_layouts(count, seed=0, processes=None, **options) -> list:
+    # Candidate i uses the seed "<seed>:<i>", so the result does not depend on the number of processes
+    # Options are passed to generate_layout, seeds without a loop are skipped
+    seeds = [f"{seed}:{index}" for index in range(count)]
+    generate = functools.partial(generate_layout, **options)
+    if processes == 1:
+        layouts = map(generate, seeds)
+    else:
+        # Few large chunks, a single layout takes well below a millisecond
+        chunk_size = max(1, count // (4 * (processes or os.cpu_count() or 1)))
+        with ProcessPoolExecutor(processes) as executor:
+            layouts = list(executor.map(generate, seeds, chunksize=chunk_size))
+    return [layout for layout in layouts if layout is not None]
+
+
+def _search_loop(rng, start, grid_size, min_tiles, max_tiles, straight_bias):
+    # Depth first search for a path returning to the start, iterative to support long loops
+    # Every stack entry holds the remaining moves of a tile in the order they are tried
+    path = [start]
+    visited = {start}
+    stack = [iter(_ordered_moves(rng, None, straight_bias))]
+    steps = 0
+    while stack:
+        steps += 1
+        if steps > config.generator_max_steps:
+            return None
+        x, y = path[-1]
+        for border in stack[-1]:
+            step = _steps[border]
+            next_position = (x + step[0], y + step[1])
+            if next_position == start and len(path) >= min_tiles:
+                return path
+            if not _can_extend(next_position, path, visited, start, grid_size, max_tiles):
+                continue
+            path.append(next_position)
+            visited.add(next_position)
+            stack.append(iter(_ordered_moves(rng, border, straight_bias)))
+            break
+        else:
+            # Dead end, go back to the previous tile
+            stack.pop()
+            visited.discard(path.pop())
+    return None
+
+
+def _ordered_moves(rng, heading, straight_bias) -> list:
+    # Border codes to leave the current tile through, going back is never possible
+    if heading is None:
+        moves = list(range(4))
+        rng.shuffle(moves)
+        return moves
+    turns = [(heading + 1) % 4, (heading + 3) % 4]
+    rng.shuffle(turns)
+    return [heading] + turns if rng.random() < straight_bias else turns + [heading]
+
+
+def _can_extend(position, path, visited, start, grid_size, max_tiles) -> bool:
+    if not (0 <= position[0] < grid_size[0] and 0 <= position[1] < grid_size[1]) or position in visited:
+        return False
+    # Prune paths that can not get back to the start within the maximum length
+    distance = abs(position[0] - start[0]) + abs(position[1] - start[1])
+    if len(path) + distance > max_tiles:
+        return False
+    return _start_is_reachable(position, visited, start, grid_size)
+
+
+def _start_is_reachable(position, visited, start, grid_size) -> bool:
+    # Flood fill over the free tiles, the path is a dead end if it enclosed itself
+    seen = {position}
+    queue = [position]
+    while queue:
+        x, y = queue.pop()
+        for step in _steps:
+            neighbour = (x + step[0], y + step[1])
+            if neighbour == start:
+                return True
+            if neighbour in seen or neighbour in visited or not (0 <= neighbour[0] < grid_size[0] and 0 <= neighbour[1] < grid_size[1]):
+                continue
+            seen.add(neighbour)
+            queue.append(neighbour)
+    return False
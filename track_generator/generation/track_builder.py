@@ -0,0 +1,71 @@
+import functools
+
+import numpy
+
+import track_generator.config as config
+from track_generator.track.track import Track
+from track_generator.track.geometry import border_vectors
+from track_generator.track.serialization import TrackData, build_track, road_element_types
+from track_generator.track.road_elements.straight_road import StraightRoad
+from track_generator.track.road_elements.arc_road import ArcRoad
+from track_generator.generation.layout_search import Layout, generate_layouts
+from track_generator.exceptions import InvalidTrackError
+
+
+def _border_center(border) -> tuple:
+    # Connection point in the middle of a border, pointing out of the tile
+    direction = border_vectors[border]
+    center = config.tile_size / 2
+    return (center + center * direction[0], center + center * direction[1], *direction)
+
+
+def _build_straight(entry_border, exit_border):
+    center = config.tile_size / 2
+    return StraightRoad.type_name, [(center, center, *border_vectors[exit_border])], [_border_center(entry_border), _border_center(exit_border)]
+
+
+@functools.lru_cache(maxsize=None)
+def _build_turn(entry_border, exit_border):
+    # Quarter circle between the border centers, the points only depend on the borders
+    road_element = ArcRoad(entry_border, exit_border, config.tile_size / 2)
+    return (ArcRoad.type_name, [(*point.position, *point.direction) for point in road_element.guide_points],
+            [(*point.position, *point.direction) for point in road_element.connection_points])
+
+
+# Road elements for tiles of a layout, by how the tile is crossed
+# "straight" tiles are left on the border opposite to the entry, "turn" tiles on an adjacent border
+# A builder takes the entry and exit border codes and returns the type name, guide points and connection points
+# Points are (x, y, direction x, direction y), the first connection point is on the entry border
+road_element_builders = {"straight": _build_straight, "turn": _build_turn}
+
+
+def layout_to_track_data(layout: Layout) -> TrackData:
+    type_names = list(road_element_types)
+    element_types, guide_point_counts, connection_point_counts, guide_points, connection_points = [], [], [], [], []
+    for grid_position, (entry_border, exit_border) in zip(layout.grid_positions, layout.get_borders()):
+        kind = "straight" if (entry_border + 2) % 4 == exit_border else "turn"
+        if kind not in road_element_builders:
+            raise InvalidTrackError(f"No road element type is registered for {kind} tiles", grid_position)
+        type_name, element_guide_points, element_connection_points = road_element_builders[kind](entry_border, exit_border)
+        element_types.append(type_names.index(type_name))
+        guide_point_counts.append(len(element_guide_points))
+        connection_point_counts.append(len(element_connection_points))
+        guide_points.extend(element_guide_points)
+        connection_points.extend(element_connection_points)
+
+    # The exit of each tile is twinned with the entry of the next one
+    entries = numpy.concatenate(([0], numpy.cumsum(connection_point_counts)[:-1]))
+    twins = numpy.stack((entries + 1, numpy.roll(entries, -1)), axis=1)
+    return TrackData(numpy.array(layout.grid_positions, dtype=numpy.int64).reshape(-1, 2), type_names, numpy.array(element_types),
+                     numpy.array(guide_point_counts), numpy.array(guide_points, dtype=float).reshape(-1, 4),
+                     numpy.array(connection_point_counts), numpy.array(connection_points, dtype=float).reshape(-1, 4), twins)
+
+
+def layout_to_track(layout: Layout) -> Track:
+    # The track is validated like a loaded track file, so the twin and border rules hold for every generated track
+    return build_track(layout_to_track_data(layout))
+
+
+def generate_tracks(count, seed=0, processes=None, **options) -> list:
+    # Layouts are searched in parallel, the tracks are built in this process since they are expensive to transfer
+    return [layout_to_track(layout) for layout in generate_layouts(count, seed, processes, **options)]
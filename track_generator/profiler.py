@@ -0,0 +1,150 @@
+import contextlib
+import json
+import time
+from collections import deque
+
+import track_generator.config as config
+
+
+class FrameProfile:
+    # Timings of one frame in seconds, phases are exclusive of the phases nested in them
+    def __init__(self, index, duration, phases, tiles):
+        self.index = index
+        self.duration = duration
+        self.phases = phases
+        # Drawing time of every tile that was drawn in the frame, by grid position
+        self.tiles = tiles
+
+    def get_other_time(self) -> float:
+        # Time not covered by any phase
+        return max(0, self.duration - sum(self.phases.values()))
+
+    def to_dict(self) -> dict:
+        return {"frame": self.index, "duration": self.duration, "phases": self.phases,
+                "tiles": [[*grid_position, seconds] for grid_position, seconds in self.tiles.items()]}
+
+
+class _Section:
+    # Context manager timing one phase, see Profiler.measure
+    __slots__ = ('_profiler', '_phase', '_tile', '_start', '_nested_time')
+
+    def __init__(self, profiler, phase, tile=None):
+        self._profiler = profiler
+        self._phase = phase
+        self._tile = tile
+
+    def __enter__(self):
+        self._nested_time = 0
+        self._profiler._sections.append(self)
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self._start
+        sections = self._profiler._sections
+        sections.pop()
+        if sections:
+            sections[-1]._nested_time += duration
+        self._profiler.add_time(self._phase, duration - self._nested_time)
+        if self._tile is not None:
+            self._profiler.add_tile_time(self._tile, duration - self._nested_time)
+
+
+class Profiler:
+    """Times the phases of every frame, disabled by default.
+
+    Instrumented code either uses measure or checks enabled before taking any time,
+    so a disabled profiler only costs an attribute lookup.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # Most recent frames, oldest first
+        self.frames = deque(maxlen=config.profiler_history_size)
+        self._frame_index = 0
+        self._frame_start = None
+        self._phases = {}
+        self._tiles = {}
+        self._sections = []
+        self._trace_file = None
+
+    def set_enabled(self, enabled) -> None:
+        self.enabled = enabled
+        if not enabled:
+            self.stop_trace()
+            self.frames.clear()
+            self._frame_start = None
+
+    def measure(self, phase):
+        # Context manager adding the time spent in it to the phase of the current frame
+        if not self.enabled or self._frame_start is None:
+            return _null_section
+        return _Section(self, phase)
+
+    def measure_tile(self, tile):
+        # Like measure, the time is also added to the drawing time of the tile
+        if not self.enabled or self._frame_start is None:
+            return _null_section
+        return _Section(self, "tiles", tile)
+
+    def add_time(self, phase, seconds) -> None:
+        if self._frame_start is not None:
+            self._phases[phase] = self._phases.get(phase, 0) + seconds
+
+    def add_tile_time(self, tile, seconds) -> None:
+        if self._frame_start is not None:
+            self._tiles[tile.grid_position] = self._tiles.get(tile.grid_position, 0) + seconds
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self._phases = {}
+        self._tiles = {}
+        self._frame_start = time.perf_counter()
+
+    def end_frame(self) -> None:
+        if not self.enabled or self._frame_start is None:
+            return
+        frame = FrameProfile(self._frame_index, time.perf_counter() - self._frame_start, self._phases, self._tiles)
+        self._frame_index += 1
+        self._frame_start = None
+        self.frames.append(frame)
+        if self._trace_file is not None:
+            self._trace_file.write(json.dumps(frame.to_dict()) + "\n")
+
+    def get_average_times(self) -> dict:
+        # Mean time per frame of every phase over the recorded frames
+        if not self.frames:
+            return {}
+        totals = {}
+        for frame in self.frames:
+            for phase, seconds in frame.phases.items():
+                totals[phase] = totals.get(phase, 0) + seconds
+        return {phase: seconds / len(self.frames) for phase, seconds in totals.items()}
+
+    def get_slowest_tiles(self, count) -> list:
+        # (grid position, seconds) of the tiles that took longest to draw in any recorded frame
+        slowest = {}
+        for frame in self.frames:
+            for grid_position, seconds in frame.tiles.items():
+                slowest[grid_position] = max(seconds, slowest.get(grid_position, 0))
+        return sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    @property
+    def is_tracing(self) -> bool:
+        return self._trace_file is not None
+
+    def start_trace(self, path) -> None:
+        # Write every following frame as one JSON object per line, see FrameProfile.to_dict
+        self.stop_trace()
+        self._trace_file = open(path, 'w')
+
+    def stop_trace(self) -> None:
+        if self._trace_file is not None:
+            self._trace_file.close()
+            self._trace_file = None
+
+
+_null_section = contextlib.nullcontext()
+
+# Profiler used by the editor and all instrumented code
+profiler = Profiler()
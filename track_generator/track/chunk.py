@@ -0,0 +1,35 @@
+import track_generator.config as config
+
+
+def get_chunk_position(grid_position) -> tuple:
+    # Chunk containing the tile, grid positions may be negative
+    return (grid_position[0] // config.chunk_size, grid_position[1] // config.chunk_size)
+
+
+def get_chunk_area(min_grid_position, max_grid_position):
+    # Chunks intersecting the grid area, min inclusive and max exclusive
+    min_chunk = get_chunk_position(min_grid_position)
+    max_chunk = get_chunk_position((max_grid_position[0] - 1, max_grid_position[1] - 1))
+    return min_chunk, (max_chunk[0] + 1, max_chunk[1] + 1)
+
+
+class Chunk:
+    """Tiles of a square area of the grid, the unit of storage, paging and render caching of a track."""
+
+    def __init__(self, position):
+        self.position = position
+        # Tiles by grid position
+        self.tiles = {}
+        # Incremented whenever a tile is added or removed or a tile looks different, used to invalidate render caches
+        self.revision = 0
+
+    def __repr__(self):
+        return f"Chunk at {self.position} with {len(self.tiles)} tiles"
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def get_grid_area(self):
+        # Grid area covered by the chunk, min inclusive and max exclusive
+        min_grid_position = (self.position[0] * config.chunk_size, self.position[1] * config.chunk_size)
+        return min_grid_position, (min_grid_position[0] + config.chunk_size, min_grid_position[1] + config.chunk_size)
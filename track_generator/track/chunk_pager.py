@@ -0,0 +1,118 @@
+import tempfile
+
+from track_generator.track.serialization import get_track_data, track_data_to_bytes, track_data_from_bytes, build_road_elements
+from track_generator.exceptions import TrackGeneratorError, InvalidTrackError
+
+
+class ChunkPager:
+    """Keeps the tiles of chunks that are paged out of a track in a file.
+
+    Chunks are stored in the binary track format. Twins across the border of a paged out chunk are unlinked
+    and remembered by (grid position, connection point index), they are linked again once both sides are loaded.
+    """
+
+    def __init__(self, file=None):
+        # Temporary file by default, it is deleted once the pager is closed
+        self._file = file if file is not None else tempfile.TemporaryFile()
+        # Chunk position to (offset, size, grid bounds) in the file, freed space is not reused
+        self._chunks = {}
+        self._end = 0
+        # Twins that are unlinked while one of them is paged out, stored in both directions
+        self._links = {}
+        # Errors of links that could not be restored, by the address of the loaded connection point
+        self._link_errors = {}
+
+    def __repr__(self):
+        return f"Chunk pager with {len(self._chunks)} chunks in {self._end} bytes"
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def __contains__(self, chunk_position):
+        return chunk_position in self._chunks
+
+    def get_chunk_positions(self) -> list:
+        return list(self._chunks)
+
+    def get_grid_bounds(self) -> list:
+        # (min, max) grid position of the tiles of every paged out chunk, max exclusive
+        return [bounds for _, _, bounds in self._chunks.values()]
+
+    def is_unlinked(self, point) -> bool:
+        # Whether the twin of a loaded connection point is paged out
+        return (point._road_element.tile.grid_position, point._get_index()) in self._links
+
+    def get_link(self, point):
+        # (grid position, connection point index) of the paged out twin of a loaded connection point, None if it has none
+        return self._links.get((point._road_element.tile.grid_position, point._get_index()))
+
+    def get_errors(self) -> list:
+        # Twins that could not be linked again after paging, they stay unlinked until a chunk of theirs is paged in again
+        return list(self._link_errors.values())
+
+    def page_out(self, track, chunk) -> None:
+        # Write the tiles of a loaded chunk to the file and remove them from the track
+        tiles = list(chunk.tiles.values())
+        tile_set = set(tiles)
+        for tile in tiles:
+            for index, point in enumerate(tile.road_element.connection_points if tile.road_element else []):
+                # Failed links are tried again when this side is paged in
+                self._link_errors.pop((tile.grid_position, index), None)
+                self._link_errors.pop(self._links.get((tile.grid_position, index)), None)
+                twin = point.twin
+                if twin is None or twin._road_element.tile in tile_set:
+                    continue
+                twin_address = (twin._road_element.tile.grid_position, twin._get_index())
+                self._links[(tile.grid_position, index)] = twin_address
+                self._links[twin_address] = (tile.grid_position, index)
+                # The twin stays in the track, it is fixed to the border until both are linked again
+                point.twin = None
+                twin.twin = None
+
+        data = track_data_to_bytes(get_track_data(track, tiles))
+        self._file.seek(self._end)
+        self._file.write(data)
+        bounds = ((min(tile.x for tile in tiles), min(tile.y for tile in tiles)),
+                  (max(tile.x for tile in tiles) + 1, max(tile.y for tile in tiles) + 1))
+        self._chunks[chunk.position] = (self._end, len(data), bounds)
+        self._end += len(data)
+        for tile in tiles:
+            tile.road_element = None
+
+    def page_in(self, chunk_position) -> list:
+        # Read the tiles of a chunk from the file, returns (grid position, road element) pairs to add to the track
+        # Twins to loaded chunks are linked by link_twins once the tiles are part of the track
+        offset, size, _ = self._chunks.pop(chunk_position)
+        self._file.seek(offset)
+        track_data = track_data_from_bytes(self._file.read(size))
+        return list(zip(map(tuple, track_data.grid_positions.tolist()), build_road_elements(track_data)))
+
+    def link_twins(self, track, tiles) -> None:
+        # Link the connection points of newly loaded tiles to their twins in loaded chunks
+        for tile in tiles:
+            for index, point in enumerate(tile.road_element.connection_points if tile.road_element else []):
+                address = (tile.grid_position, index)
+                twin_address = self._links.get(address)
+                if twin_address is None:
+                    continue
+                twin_tile = track.get_loaded_tile(twin_address[0])
+                if twin_tile is None:
+                    continue
+                # The tile of the twin may have been given another road element in the meantime
+                if twin_tile.road_element is not None and twin_address[1] < len(twin_tile.road_element.connection_points):
+                    twin = twin_tile.road_element.connection_points[twin_address[1]]
+                    try:
+                        # The loaded twin may have been moved while this side was paged out, solve this side to match it
+                        point.set_twin(twin)
+                    except TrackGeneratorError as e:
+                        # The link is kept, the points stay unlinked and are reported by Track.validate
+                        self._link_errors.pop(twin_address, None)
+                        self._link_errors[address] = InvalidTrackError(f"Could not link the twin after paging in its chunk, {e}", point)
+                        continue
+                del self._links[address]
+                del self._links[twin_address]
+                self._link_errors.pop(address, None)
+                self._link_errors.pop(twin_address, None)
+
+    def close(self) -> None:
+        self._file.close()
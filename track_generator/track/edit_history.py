@@ -0,0 +1,203 @@
+import contextlib
+from collections import deque
+
+import track_generator.config as config
+from track_generator.track.point_store import point_store, unpack
+from track_generator.track.road_element import RoadElementState
+from track_generator.exceptions import TrackGeneratorError, InvalidTrackError
+
+
+class EditHistory:
+    """Undo and redo of the geometry and twin changes of a track.
+
+    Every step stores the state before and after the change for each road element and connection point
+    it touched, addressed by grid position so the steps stay valid when chunks are paged. Changes within
+    a group, e.g. a whole drag, are merged into one step that keeps the first before and the last after state.
+    """
+
+    def __init__(self, track):
+        self.track = track
+        self._undo_steps = deque(maxlen=config.history_size)
+        self._redo_steps = []
+        # (kind, address) to [before, after] of the step being recorded, see group
+        self._changes = {}
+        self._group_depth = 0
+        # Undo, redo and paging change the track without being recorded
+        self._pause_depth = 0
+
+    def __repr__(self):
+        return f"Edit history with {len(self._undo_steps)} undo and {len(self._redo_steps)} redo steps"
+
+    @property
+    def is_recording(self) -> bool:
+        return self._pause_depth == 0
+
+    def can_undo(self) -> bool:
+        return bool(self._undo_steps)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo_steps)
+
+    def begin_group(self) -> None:
+        # All changes until the outermost group is ended become one step, e.g. all moves of a drag
+        self._group_depth += 1
+
+    def end_group(self) -> None:
+        self._group_depth -= 1
+        if self._group_depth == 0:
+            self._commit()
+
+    @contextlib.contextmanager
+    def group(self):
+        self.begin_group()
+        try:
+            yield
+        finally:
+            self.end_group()
+
+    @contextlib.contextmanager
+    def paused(self):
+        self._pause_depth += 1
+        try:
+            yield
+        finally:
+            self._pause_depth -= 1
+
+    def has_state(self, road_element) -> bool:
+        # Whether the step being recorded already holds the state of the road element before its first change
+        return road_element.tile is not None and ("state", road_element.tile.grid_position) in self._changes
+
+    def pack_state(self, road_element) -> tuple:
+        # Number of guide points and the coordinates read from the point store, about 100 bytes for a straight road
+        return len(road_element.guide_points), point_store.pack(road_element.get_slots())
+
+    def record_state(self, road_element, before) -> None:
+        # Called by RoadElement.set_state after the change with the packed state before, None if has_state
+        if self.is_recording and road_element.tile is not None:
+            self._record(("state", road_element.tile.grid_position), before, self.pack_state(road_element))
+
+    def record_twin(self, point, before, after) -> None:
+        # Called by ConnectionPoint.set_twin, before and after are (twin, fixed to border)
+        if self.is_recording and point._road_element.tile is not None:
+            self._record(("twin", _get_address(point)), (_get_address(before[0]), before[1]), (_get_address(after[0]), after[1]))
+
+    def undo(self) -> bool:
+        # Returns whether a step was undone, nothing is undone while a group is recorded
+        # Raises InvalidTrackError and keeps the step if it would make the track invalid
+        if not self._undo_steps or self._group_depth:
+            return False
+        step = self._undo_steps[-1]
+        self._apply_checked(step, 0)
+        self._redo_steps.append(self._undo_steps.pop())
+        return True
+
+    def redo(self) -> bool:
+        if not self._redo_steps or self._group_depth:
+            return False
+        step = self._redo_steps[-1]
+        self._apply_checked(step, 1)
+        self._undo_steps.append(self._redo_steps.pop())
+        return True
+
+    def clear(self) -> None:
+        self._undo_steps.clear()
+        self._redo_steps.clear()
+
+    def _record(self, key, before, after) -> None:
+        change = self._changes.get(key)
+        if change is None:
+            self._changes[key] = [before, after]
+        else:
+            change[1] = after
+        if self._group_depth == 0:
+            self._commit()
+
+    def _commit(self) -> None:
+        # Changes that were reverted within the group, e.g. by a failed set_twin, are dropped
+        step = [(kind, address, before, after) for (kind, address), (before, after) in self._changes.items() if before != after]
+        self._changes = {}
+        if step:
+            self._undo_steps.append(step)
+            self._redo_steps.clear()
+
+    def _apply_checked(self, step, index) -> None:
+        # Apply the step and set it back if the track has more errors than before
+        error_count = len(self.track.validate())
+        try:
+            self._apply(step, index)
+            error = None if len(self.track.validate()) <= error_count else "it would leave twinned connection points apart"
+        except TrackGeneratorError as e:
+            error = e
+        if error is not None:
+            self._apply(step, 1 - index, move_twins=False)
+            raise InvalidTrackError(f"Could not {'redo' if index else 'undo'} the last step, {error}")
+
+    def _apply(self, step, index, move_twins=True) -> None:
+        # Set the before (index 0) or after (index 1) values of every change, the values are consistent as a whole
+        road_elements = []
+        with self.paused():
+            for kind, address, *values in (step if index else reversed(step)):
+                if kind == "state":
+                    road_element = self.track.get_tile(address).road_element
+                    road_element.set_state(_unpack_state(values[index]))
+                    road_elements.append(road_element)
+                else:
+                    point = self._get_point(address)
+                    twin_address, fixed_to_border = values[index]
+                    point.twin = self._get_point(twin_address)
+                    if fixed_to_border:
+                        point.fix_to_border()
+                    else:
+                        point.release_from_border()
+        if move_twins:
+            self._move_twins_along(step, index, road_elements)
+
+    def _move_twins_along(self, step, index, road_elements) -> None:
+        # Road elements outside of the step can have been moved without being recorded, e.g. when a paged in chunk
+        # was linked to the edited side. They are solved to match their twins again and the moves become part
+        # of the step, so undoing and redoing it later moves them as well
+        in_step = set(road_elements)
+        self._group_depth += 1
+        try:
+            for road_element in road_elements:
+                for point in road_element.connection_points:
+                    twin = point.twin
+                    if twin is None or twin._road_element in in_step or _is_matching(point, twin):
+                        continue
+                    twin._road_element.update_connection_point(twin._get_index(), point.get_mirrored_position(), -point.direction)
+        finally:
+            self._group_depth -= 1
+            changes, self._changes = self._changes, {}
+            positions = {(kind, address): position for position, (kind, address, *_) in enumerate(step)}
+            for key, (before, after) in changes.items():
+                # The moved state belongs to the side of the step that was applied
+                values = [after, before] if index == 0 else [before, after]
+                if key in positions:
+                    values[1 - index] = step[positions[key]][2 + 1 - index]
+                    step[positions[key]] = (*key, *values)
+                else:
+                    step.append((*key, *values))
+
+    def _get_point(self, address):
+        if address is None:
+            return None
+        grid_position, index = address
+        return self.track.get_tile(grid_position).road_element.connection_points[index]
+
+
+def _is_matching(point, twin) -> bool:
+    position, direction = point.get_mirrored_position(), -point.direction
+    return (abs(position[0] - twin.position[0]) <= 1e-6 and abs(position[1] - twin.position[1]) <= 1e-6
+            and abs(direction[0] - twin.direction[0]) <= 1e-6 and abs(direction[1] - twin.direction[1]) <= 1e-6)
+
+
+def _get_address(point):
+    # (grid position, index) of a connection point, None for no point or a point that is not on a track anymore
+    if point is None or point._road_element.tile is None:
+        return None
+    return point._road_element.tile.grid_position, point._get_index()
+
+
+def _unpack_state(values) -> RoadElementState:
+    guide_point_count, data = values
+    return RoadElementState.from_lists(guide_point_count, *unpack(data))
@@ -0,0 +1,114 @@
+import numpy
+
+import track_generator.config as config
+
+# Vectorized versions of the tile geometry of ConnectionPoint and StraightRoad
+# Positions and directions are (n, 2) arrays in tile coordinates
+
+# Border vectors indexed by border code, opposite borders differ by 2, -1 is used for no border
+border_vectors = numpy.array([(-1, 0), (0, -1), (1, 0), (0, 1)])  # Left, top, right, bottom
+
+
+def border_codes(positions, directions) -> numpy.ndarray:
+    # Same rules and precedence as ConnectionPoint._validate_border
+    positions, directions = _as_points(positions), _as_points(directions)
+    x, y = positions.T
+    direction_x, direction_y = directions.T
+    codes = numpy.full(len(positions), -1)
+    # Assigned in reverse order of precedence
+    codes[(y == config.tile_size) & (direction_y > 0)] = 3
+    codes[(y == 0) & (direction_y < 0)] = 1
+    codes[(x == config.tile_size) & (direction_x > 0)] = 2
+    codes[(x == 0) & (direction_x < 0)] = 0
+    return codes
+
+
+def mirrored_positions(positions, borders) -> numpy.ndarray:
+    # Position on the adjacent tile, see ConnectionPoint.get_mirrored_position
+    positions = _as_points(positions)
+    horizontal = (numpy.asarray(borders) % 2 == 0)[:, None]
+    return numpy.where(horizontal, [config.tile_size, 0], [0, config.tile_size]) + numpy.where(horizontal, [-1, 1], [1, -1]) * positions
+
+
+def is_inside_tile(positions) -> numpy.ndarray:
+    x, y = _as_points(positions).T
+    return (0 <= x) & (x < config.tile_size + 1) & (0 <= y) & (y < config.tile_size + 1)
+
+
+def distances_to_borders(positions, directions) -> numpy.ndarray:
+    # Distances along the directions to the right, top, left and bottom border, infinite if parallel
+    positions, directions = _as_points(positions), _normalize(_as_points(directions))
+    borders = numpy.array([config.tile_size, 0, 0, config.tile_size])
+    axes = [0, 1, 0, 1]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        distances = (borders - positions[:, axes]) / directions[:, axes]
+    return numpy.where(directions[:, axes] != 0, distances, numpy.inf)
+
+
+def border_intersections(positions, directions):
+    # Intersections of the lines through the points with the tile borders, see StraightRoad._border_intersection_from_point
+    # Returns the back positions, their borders, the front positions and their borders
+    # The back point has the reversed direction, a border of -1 marks points without a valid intersection
+    positions, directions = _as_points(positions), _normalize(_as_points(directions))
+    distances = distances_to_borders(positions, directions)
+    inside = is_inside_tile(positions)[:, None]
+    x, y = positions.T
+    at_tile_height = ((0 <= x) & (x <= config.tile_size) | (0 <= y) & (y <= config.tile_size))[:, None]
+
+    # Ignore the border with the smallest distance if the point is not at the height or width of the tile
+    outside_distances = numpy.where(~at_tile_height & (distances == distances.min(axis=1, keepdims=True)), numpy.nan, distances)
+    with numpy.errstate(invalid='ignore'):
+        outside_back = numpy.where(outside_distances > 0, outside_distances, numpy.inf).min(axis=1, keepdims=True)
+        outside_front = numpy.where((outside_distances >= 0) & (outside_distances != outside_back), outside_distances, numpy.inf).min(axis=1)
+
+        # If the point lies within the tile, the front point has the smallest positive distance
+        inside_front = numpy.where(distances > 0, distances, numpy.inf).min(axis=1)
+        inside_back = numpy.where(distances <= 0, distances, -numpy.inf).max(axis=1)
+
+    distance_back = numpy.where(inside[:, 0], inside_back, outside_back[:, 0])
+    distance_front = numpy.where(inside[:, 0], inside_front, outside_front)
+    back_positions = _points_on_borders(positions, directions, distances, distance_back)
+    front_positions = _points_on_borders(positions, directions, distances, distance_front)
+    back_borders = border_codes(back_positions, -directions)
+    front_borders = border_codes(front_positions, directions)
+    
+    invalid = ~(numpy.isfinite(distance_back) & numpy.isfinite(distance_front))
+    back_borders[invalid] = -1
+    front_borders[invalid] = -1
+    return back_positions, back_borders, front_positions, front_borders
+
+
+def restrict_to_tile(positions, anchor_positions=None) -> numpy.ndarray:
+    # Points outside the tile are moved to the border along the line from the anchor, see StraightRoad._restrict_position_to_selected_tile
+    # The anchor defaults to the center of the tile, positions without a valid intersection become NaN
+    positions = _as_points(positions)
+    if anchor_positions is None:
+        anchor_positions = numpy.full(positions.shape, config.tile_size / 2)
+    anchor_positions = numpy.broadcast_to(_as_points(anchor_positions), positions.shape)
+    inside = is_inside_tile(positions)
+    restricted = positions.copy()
+    outside = numpy.flatnonzero(~inside)
+    if len(outside):
+        _, _, front_positions, front_borders = border_intersections(anchor_positions[outside], positions[outside] - anchor_positions[outside])
+        front_positions[front_borders < 0] = numpy.nan
+        restricted[outside] = front_positions
+    return restricted
+
+
+def _points_on_borders(positions, directions, distances, distance) -> numpy.ndarray:
+    # Snap the intersections exactly onto the border, in the order of distances_to_borders
+    with numpy.errstate(invalid='ignore'):
+        points = positions + distance[:, None] * directions
+    border_index = numpy.argmax(distances == distance[:, None], axis=1)
+    rows = numpy.arange(len(points))
+    points[rows, border_index % 2] = numpy.array([config.tile_size, 0, 0, config.tile_size])[border_index]
+    return points
+
+
+def _as_points(points) -> numpy.ndarray:
+    return numpy.asarray(points, dtype=float).reshape(-1, 2)
+
+
+def _normalize(directions) -> numpy.ndarray:
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return directions / numpy.linalg.norm(directions, axis=1, keepdims=True)
@@ -0,0 +1,125 @@
+import track_generator.regulations as regulations
+
+# Dashes follow the arc length s along the centerline of a chain of road elements
+# A point is part of a dash where (s + phase) modulo twice the dash length is smaller than the dash length
+
+
+def draw_dashed_polyline(surface, color, points, width, dash_length=regulations.lane_marking_dash_length, phase=0, scale=1, offset=(0, 0)):
+    # Points, width and dash length are given in mm, the dashes of all segments are computed in one vectorized pass
+    # and every dash is filled as a quad, a dash that continues across a corner of the polyline is one quad per segment
+    # pygame has no call that fills many polygons, so the quads are filled one by one. Blitting a stamp of a dash with
+    # Surface.blits was measured to be slower for the few dashes of a road element, see the draw_lane_markings benchmark
+    # Only needed for rendering, the phases below are also used by headless tracks
+    import numpy
+    import pygame
+    points = numpy.asarray(points, dtype=float) * scale + numpy.asarray(offset, dtype=float)
+    vectors = numpy.diff(points, axis=0)
+    lengths = numpy.linalg.norm(vectors, axis=1)
+    starts = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1])) + phase * scale
+    half_width = max(0.5, width * scale / 2)
+    period = 2 * dash_length * scale
+
+    # Dash k of the pattern covers the arc length from k periods to k and a half periods
+    first_dashes = numpy.floor(starts / period)
+    counts = numpy.where(lengths > 0, numpy.ceil((starts + lengths) / period) - first_dashes, 0).astype(int)
+    segments = numpy.repeat(numpy.arange(len(lengths)), counts)
+    dashes = first_dashes[segments] + numpy.arange(len(segments)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    dash_starts = numpy.maximum(dashes * period - starts[segments], 0)
+    dash_ends = numpy.minimum(dashes * period + period / 2 - starts[segments], lengths[segments])
+    visible = dash_ends > dash_starts
+    segments, dash_starts, dash_ends = segments[visible], dash_starts[visible, None], dash_ends[visible, None]
+
+    directions = vectors[segments] / lengths[segments, None]
+    normals = numpy.stack((-directions[:, 1], directions[:, 0]), axis=1) * half_width
+    dash_start_points = points[segments] + directions * dash_starts
+    dash_end_points = points[segments] + directions * dash_ends
+    quads = numpy.stack((dash_start_points + normals, dash_end_points + normals, dash_end_points - normals, dash_start_points - normals), axis=1)
+    # Skip the dashes outside of the clip area
+    clip = surface.get_clip()
+    inside = ((quads[:, :, 0].max(axis=1) >= clip.left) & (quads[:, :, 0].min(axis=1) < clip.right)
+              & (quads[:, :, 1].max(axis=1) >= clip.top) & (quads[:, :, 1].min(axis=1) < clip.bottom))
+    for quad in quads[inside].tolist():
+        pygame.draw.polygon(surface, color, quad)
+
+
+def update_lane_marking_phases(road_elements) -> list:
+    # Continue the dash pattern across twinned road elements, so dashes are not cut at tile borders
+    # Returns the road elements whose phase has changed
+    visited = set()
+    changed = []
+    for road_element in road_elements:
+        if id(road_element) in visited:
+            continue
+        arc_length = 0
+        for current, entry_index in iter_chain(road_element):
+            if id(current) in visited:
+                break
+            visited.add(id(current))
+            length = current.get_length()
+            # The pattern is mirrored if the chain enters the road element at its second connection point
+            if entry_index == 0:
+                phase = arc_length % (2 * regulations.lane_marking_dash_length)
+            else:
+                phase = (regulations.lane_marking_dash_length - arc_length - length) % (2 * regulations.lane_marking_dash_length)
+            if phase != current.lane_marking_phase:
+                current.lane_marking_phase = phase
+                changed.append(current)
+            arc_length += length
+    return changed
+
+
+def iter_chain(road_element):
+    # (road element, entry index) of the chain of twinned road elements containing the road element in driving order
+    # The order does not depend on the road element the chain is walked from, so the phases stay put while editing:
+    # open chains start at the end with the smaller grid position, closed loops at the road element with the smallest
+    # grid position entered through its first connection point
+    start, entry_index = find_chain_start(road_element)
+    chain = []
+    current = start
+    while current is not None:
+        chain.append((current, entry_index))
+        current, entry_index = _next_in_chain(current, 1 - entry_index)
+        if current is start:
+            break
+    if current is None:
+        if _get_grid_position(chain[-1][0]) < _get_grid_position(chain[0][0]) and len(chain[-1][0].connection_points) == 2:
+            chain = _reverse_chain(chain)
+    else:
+        index = min(range(len(chain)), key=lambda index: _get_grid_position(chain[index][0]))
+        if chain[index][1] != 0:
+            chain = _reverse_chain(chain)
+            index = len(chain) - 1 - index
+        chain = chain[index:] + chain[:index]
+    yield from chain
+
+
+def find_chain_start(road_element):
+    # (road element, entry index) the chain starts at, see iter_chain
+    # Walk backwards until the end of the chain, or once around a closed loop
+    current, entry_index = road_element, 0
+    while True:
+        previous, previous_exit = _next_in_chain(current, entry_index)
+        if previous is None:
+            return current, entry_index
+        if previous is road_element:
+            return road_element, 0
+        current, entry_index = previous, 1 - previous_exit
+
+
+def _reverse_chain(chain) -> list:
+    return [(road_element, 1 - entry_index) for road_element, entry_index in reversed(chain)]
+
+
+def _get_grid_position(road_element) -> tuple:
+    # Road elements that are not placed on a tile come first
+    return road_element.tile.grid_position if road_element.tile is not None else ()
+
+
+def _next_in_chain(road_element, exit_index):
+    # Road element behind the connection point and the index of the connection point the chain enters through
+    if len(road_element.connection_points) != 2:
+        return None, None
+    twin = road_element.connection_points[exit_index].twin
+    if twin is None:
+        return None, None
+    return twin._road_element, twin._get_index()
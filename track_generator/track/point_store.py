@@ -0,0 +1,73 @@
+import numpy
+
+
+class PointStore:
+    """Struct of arrays holding the coordinates of track points.
+
+    Every TrackPoint owns one slot. Slots of deleted points are reused, so the arrays may contain unused rows.
+    """
+
+    def __init__(self, capacity=1024):
+        self.positions = numpy.zeros((capacity, 2))
+        self.directions = numpy.zeros((capacity, 2))
+        # Border code of connection points, see geometry.border_vectors, -1 for guide points
+        self.borders = numpy.full(capacity, -1, dtype=numpy.int8)
+        # Slot of the twin of a connection point, -1 if it has none
+        self.twins = numpy.full(capacity, -1, dtype=numpy.int64)
+        self._free_slots = []
+        self._size = 0
+
+    def __len__(self):
+        # Number of slots in use or freed, valid slots are always smaller
+        return self._size
+
+    def allocate(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._size == len(self.positions):
+            self._grow(2 * len(self.positions))
+        self._size += 1
+        return self._size - 1
+
+    def set(self, slot, position, direction, border=-1) -> None:
+        # Values are written as they are, directions have to be normalized
+        # Single elements are written, which is faster than rows for one point
+        self.positions[slot, 0] = position[0]
+        self.positions[slot, 1] = position[1]
+        self.directions[slot, 0] = direction[0]
+        self.directions[slot, 1] = direction[1]
+        self.borders[slot] = border
+
+    def read(self, slots) -> tuple:
+        # Lists of the positions, directions and border codes of the slots, read in one go
+        return (self.positions.take(slots, axis=0).tolist(), self.directions.take(slots, axis=0).tolist(),
+                self.borders.take(slots).tolist())
+
+    def pack(self, slots) -> bytes:
+        # Positions, directions and border codes of the slots as raw bytes, 33 bytes per slot, see unpack
+        return self.positions.take(slots, axis=0).tobytes() + self.directions.take(slots, axis=0).tobytes() + self.borders.take(slots).tobytes()
+
+    def release(self, slot) -> None:
+        self.borders[slot] = -1
+        self.twins[slot] = -1
+        self._free_slots.append(slot)
+
+    def _grow(self, capacity) -> None:
+        size = self._size
+        for name, fill in (("positions", 0), ("directions", 0), ("borders", -1), ("twins", -1)):
+            array = getattr(self, name)
+            grown = numpy.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+            grown[:size] = array[:size]
+            setattr(self, name, grown)
+
+
+def unpack(data) -> tuple:
+    # Lists of the positions, directions and border codes packed by PointStore.pack
+    count = len(data) // 33
+    positions = numpy.frombuffer(data, numpy.float64, 2 * count).reshape(-1, 2).tolist()
+    directions = numpy.frombuffer(data, numpy.float64, 2 * count, 16 * count).reshape(-1, 2).tolist()
+    return positions, directions, numpy.frombuffer(data, numpy.int8, count, 32 * count).tolist()
+
+
+# Store used by all points unless another one is passed
+point_store = PointStore()
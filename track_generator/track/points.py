@@ -1,30 +1,57 @@
-import pygame
-
 import track_generator.config as config
-from track_generator.exceptions import InvalidPositionError, InvalidTrackError
+from track_generator.track.vector import Vector2, from_floats
+from track_generator.track.point_store import point_store
+from track_generator.exceptions import TrackGeneratorError, InvalidPositionError, InvalidTrackError
+
+# Border vectors indexed by border code, same order as geometry.border_vectors
+_border_vectors = ((-1, 0), (0, -1), (1, 0), (0, 1))  # Left, top, right, bottom
 
 
 class TrackPoint:
+    # Coordinates are kept in the shared point_store, the point itself only references its slot
+    __slots__ = ('_road_element', '_slot')
+
     def __init__(self, road_element, position=(0, 0), direction=(0, 0)):
         self._road_element = road_element
-        self._position = pygame.Vector2(position)
-        self._direction = pygame.Vector2(direction).normalize()
+        self._slot = point_store.allocate()
+        point_store.positions[self._slot] = tuple(position)
+        point_store.directions[self._slot] = tuple(Vector2(direction).normalize())
+
+    def __del__(self):
+        # The slot is missing if the constructor failed
+        slot = getattr(self, '_slot', None)
+        if slot is not None:
+            point_store.release(slot)
+
+    def __getstate__(self):
+        # Slots are only valid in the store of this process, pickle the coordinates instead
+        return {'_road_element': self._road_element, 'position': tuple(self.position), 'direction': tuple(self.direction)}
+
+    def __setstate__(self, state):
+        TrackPoint.__init__(self, state['_road_element'], state['position'], state['direction'])
 
     @property
-    def position(self) -> pygame.Vector2:
-        return self._position
+    def position(self) -> Vector2:
+        positions = point_store.positions
+        return from_floats(positions.item(self._slot, 0), positions.item(self._slot, 1))
 
     @property
-    def direction(self) -> pygame.Vector2:
-        return self._direction
+    def direction(self) -> Vector2:
+        directions = point_store.directions
+        return from_floats(directions.item(self._slot, 0), directions.item(self._slot, 1))
 
     @position.setter
     def position(self, position):
-        self._position = pygame.Vector2(position)
+        point_store.positions[self._slot] = position[0], position[1]
 
     @direction.setter
     def direction(self, direction):
-        self._direction = pygame.Vector2(direction).normalize()
+        direction = Vector2(direction).normalize()
+        point_store.directions[self._slot] = direction.x, direction.y
+
+    def get_slot(self) -> int:
+        # Row of this point in the arrays of point_store
+        return self._slot
 
     def update(self, position, direction):
         self.position = position
@@ -32,6 +59,8 @@ class TrackPoint:
 
 
 class GuidePoint(TrackPoint):
+    __slots__ = ()
+
     def __init__(self, road_element, position, direction):
         super().__init__(road_element, position, direction)
 
@@ -40,17 +69,55 @@ class GuidePoint(TrackPoint):
 
 
 class ConnectionPoint(TrackPoint):
-    def __init__(self, road_element, position, direction):
+    __slots__ = ('_twin', '_index', '_fixed_to_border')
+
+    def __init__(self, road_element, position, direction, border=None):
         super().__init__(road_element, position, direction)
         
-        self.twin = None
-        self._was_visited = False
-        self._border = self._validate_border(self.position, self.direction)
+        self._twin = None
+        self._index = None
+        # The border code can be passed if it was already validated, e.g. when loading a track
+        if border is None:
+            border = self._validate_border(self.position, self.direction)
+        point_store.borders[self._slot] = border
         self._fixed_to_border = False
 
     def __repr__(self):
         return f"Connection point at {self.position} with direction {self.direction}"
 
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.update(border=self.get_border_code(), twin=self._twin, index=self._index, fixed_to_border=self._fixed_to_border)
+        return state
+
+    def __setstate__(self, state):
+        ConnectionPoint.__init__(self, state['_road_element'], state['position'], state['direction'], state['border'])
+        self._index = state['index']
+        self._fixed_to_border = state['fixed_to_border']
+        # The twin is linked in the store by whichever of both points is restored last
+        # The track graph is pickled with the track, so the twin setter is not used
+        self._twin = state['twin']
+        if self._twin is not None and hasattr(self._twin, '_slot'):
+            point_store.twins[self._slot] = self._twin._slot
+            point_store.twins[self._twin._slot] = self._slot
+
+    @property
+    def twin(self):
+        return self._twin
+
+    @twin.setter
+    def twin(self, twin):
+        previous_twin = self._twin
+        self._twin = twin
+        point_store.twins[self._slot] = twin._slot if twin is not None else -1
+        graph = self._road_element.get_track_graph() if self._road_element is not None else None
+        if graph is not None:
+            graph.handle_twin_changed(self, previous_twin)
+            track = self._road_element.tile.track
+            track.handle_chain_changed(self._road_element)
+            if previous_twin is not None:
+                track.handle_chain_changed(previous_twin._road_element)
+
     @TrackPoint.position.setter
     def position(self, position):
         self.update(position, self.direction)
@@ -60,27 +127,36 @@ class ConnectionPoint(TrackPoint):
         self.update(self.position, direction)
 
     def update(self, position, direction):
-        self._was_visited = True
-        if self.twin:
-            mirrored_position = self.get_mirrored_position(position)
-            self.twin.handle_update_from_twin(mirrored_position, -direction)
-        self._update(position, direction)
-        self._was_visited = False
+        # Only this point is moved, the change is propagated to the twin
+        state = self._road_element.get_state()
+        state.connection_points[self._get_index()] = self.check_update(position, direction)
+        self._road_element.update_state(state)
 
     def set_twin(self, twin):
+        history = self._road_element.get_edit_history()
+        if history is None:
+            self._set_twin(twin)
+            return
+        # The twins and the moved road elements become one undo step
+        previous_values = [(point.twin, point.is_fixed_to_border()) for point in (self, twin)]
+        with history.group():
+            self._set_twin(twin)
+            for point, previous in zip((self, twin), previous_values):
+                history.record_twin(point, previous, (point.twin, point.is_fixed_to_border()))
+
+    def _set_twin(self, twin):
+        previous_twins = (self.twin, twin.twin)
         self.twin = twin
         self.twin.twin = self
         position = self.twin.get_mirrored_position()
-        self._was_visited = True
-        self._road_element.update_connection_point(self._get_index(), position, -twin.direction)
+        try:
+            self._road_element.update_connection_point(self._get_index(), position, -twin.direction)
+        except TrackGeneratorError:
+            # The update did not change the track, so the twins can simply be restored
+            self.twin, twin.twin = previous_twins
+            raise
         self.fix_to_border()
         self.twin.fix_to_border()
-        self._was_visited = False
-
-    def handle_update_from_twin(self, position, direction):
-        if self._was_visited:
-            return
-        self._road_element.update_connection_point(self._get_index(), position, direction)
 
     def fix_to_border(self):
         self._fixed_to_border = True
@@ -91,38 +167,65 @@ class ConnectionPoint(TrackPoint):
     def is_fixed_to_border(self):
         return self._fixed_to_border
 
-    def get_border(self):
-        return self._border
+    def get_border(self) -> Vector2:
+        return Vector2(_border_vectors[self.get_border_code()])
 
-    def get_mirrored_position(self, position: pygame.Vector2=None):
+    def get_border_code(self) -> int:
+        return point_store.borders.item(self._slot)
+
+    def get_mirrored_position(self, position: Vector2=None):
         if position is None:
             position = self.position
-        if self._border.x != 0:
-            return pygame.Vector2(config.tile_size - position.x, position.y)
-        elif self._border.y != 0:
-            return pygame.Vector2(position.x, config.tile_size - position.y)
+        return mirror_position(position, self.get_border_code())
 
-    def _get_index(self):
-        return self._road_element.connection_points.index(self)
-
-    def _update(self, position, direction):
-        position = pygame.Vector2(round(position[0]), round(position[1]))
-        direction = pygame.Vector2(direction).normalize()
+    def check_update(self, position, direction):
+        # Validate a new position and direction without changing the point
+        # Returns the rounded position, the normalized direction and the border code
+        position = Vector2(round(position[0]), round(position[1]))
+        direction = Vector2(direction).normalize()
         border = self._validate_border(position, direction)
-        if self.is_fixed_to_border() and border != self._border:
-            raise InvalidPositionError(f"Connection point is fixed to border {self.get_border()}, but new border is {border}", position, self)
-        self._position = position
-        self._direction = direction
-        self._border = border
-
-    def _validate_border(self, position, direction) -> pygame.Vector2:
-        if position.x == 0 and direction.x < 0:
-            return pygame.Vector2(-1, 0)  # Left
-        elif position.x == config.tile_size and direction.x > 0:
-            return pygame.Vector2(1, 0)  # Right
-        elif position.y == 0 and direction.y < 0:
-            return pygame.Vector2(0, -1)  # Top
-        elif position.y == config.tile_size and direction.y > 0:
-            return pygame.Vector2(0, 1)  # Bottom
-        else:
+        if self.is_fixed_to_border() and border != self.get_border_code():
+            raise InvalidPositionError(f"Connection point is fixed to border {self.get_border()}, but new border is {Vector2(_border_vectors[border])}", position, self)
+        return position, direction, border
+
+    def _get_index(self):
+        # The order of the connection points of a road element never changes
+        if self._index is None:
+            self._index = self._road_element.connection_points.index(self)
+        return self._index
+
+    def _set(self, position, direction, border):
+        # Values have to be validated by check_update
+        point_store.set(self._slot, position, direction, border)
+
+    def _validate_border(self, position, direction) -> int:
+        border = get_border_code(position, direction)
+        if border is None:
             raise InvalidPositionError("Connection point is not on the border of the tile, or direction is invalid", position, self)
+        return border
+
+
+def mirror_position(position, border) -> Vector2:
+    # Position of the twin of a connection point on the border with the given code
+    if border % 2 == 0:
+        return Vector2(config.tile_size - position[0], position[1])
+    return Vector2(position[0], config.tile_size - position[1])
+
+
+def get_border_code(position, direction) -> int:
+    # Border code of a connection point with the given position and direction, None if it is not on a border
+    if position[0] == 0 and direction[0] < 0:
+        return 0  # Left
+    elif position[0] == config.tile_size and direction[0] > 0:
+        return 2  # Right
+    elif position[1] == 0 and direction[1] < 0:
+        return 1  # Top
+    elif position[1] == config.tile_size and direction[1] > 0:
+        return 3  # Bottom
+    return None
+
+
+def get_border(position, direction) -> Vector2:
+    # Border a connection point with the given position and direction lies on, None if it is not on a border
+    border = get_border_code(position, direction)
+    return Vector2(_border_vectors[border]) if border is not None else None
@@ -1,14 +1,156 @@
+from track_generator.track.vector import Vector2, from_floats
+from track_generator.track.points import GuidePoint, ConnectionPoint, get_border_code
+from track_generator.track.point_store import point_store
+from track_generator.track.twin_propagation import propagate_update
+from track_generator.exceptions import InvalidPositionError
+from track_generator.profiler import profiler
+
+
+class RoadElementState:
+    # Geometry of a road element that is not applied yet
+    # Guide points are (position, direction) and connection points (position, direction, border code) tuples
+    def __init__(self, guide_points, connection_points):
+        self.guide_points = guide_points
+        self.connection_points = connection_points
+
+    @classmethod
+    def from_lists(cls, guide_point_count, positions, directions, borders):
+        # State from the coordinates of the guide points followed by the connection points, see PointStore.read
+        points = [(from_floats(*position), from_floats(*direction)) for position, direction in zip(positions, directions)]
+        connection_points = [(position, direction, border) for (position, direction), border in zip(points[guide_point_count:], borders[guide_point_count:])]
+        return cls(points[:guide_point_count], connection_points)
+
+
 class RoadElement:
 
+    # Name used to identify the element type in track files
+    type_name = None
+
     def __init__(self):
         self.connection_points = []
         self.guide_points = []
+        # Incremented whenever the geometry changes, used to invalidate render caches
+        self.version = 0
+        # Offset of the dash pattern at the first connection point in mm, see lane_markings
+        self.lane_marking_phase = 0
+        # Tile the road element is placed on, set by Tile
+        self.tile = None
 
-    def render(self, surface):
+    @classmethod
+    def from_points(cls, guide_points, connection_points):
+        # Restore a road element from stored points without solving its geometry again
+        # Guide points are (position, direction) and connection points (position, direction, border code) tuples
+        road_element = cls.__new__(cls)
+        RoadElement.__init__(road_element)
+        road_element.guide_points = [GuidePoint(road_element, position, direction) for position, direction in guide_points]
+        road_element.connection_points = [ConnectionPoint(road_element, position, direction, border) for position, direction, border in connection_points]
+        road_element._restore()
+        return road_element
+
+    def render(self, surface, scale=1, offset=(0, 0)):
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def get_length(self):
+        # Length of the centerline in mm
         raise NotImplementedError("This method should be overridden by subclasses")
 
-    def update_guide_point(self, index, position, direction):
+    def get_centerline(self, scale=1):
+        # (n, 2) array of the centerline in mm from the first to the last connection point
+        # Curves are tessellated finely enough for the scale, so render, lane markings and exports share the polyline
         raise NotImplementedError("This method should be overridden by subclasses")
+
+    def update_guide_point(self, index, position, direction=None):
+        # Returns the road elements that were changed, including the twins of the connection points
+        with profiler.measure("geometry"):
+            return self.update_state(self.solve_guide_point(index, position, direction))
     
-    def update_connection_point(self, index, position, direction):
+    def update_connection_point(self, index, position, direction=None):
+        with profiler.measure("geometry"):
+            return self.update_state(self.solve_connection_point(index, position, direction))
+
+    def update_state(self, state):
+        # Apply a new state and move the twins of the connection points along
+        # Either all road elements are updated or none if one of them can not be solved
+        history = self.get_edit_history()
+        if history is None:
+            return propagate_update(self, state)
+        # All road elements moved along become one undo step
+        with history.group():
+            return propagate_update(self, state)
+
+    def solve_guide_point(self, index, position, direction=None) -> RoadElementState:
+        # New state after moving a guide point, the road element itself is not changed
         raise NotImplementedError("This method should be overridden by subclasses")
+    
+    def solve_connection_point(self, index, position, direction=None) -> RoadElementState:
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def get_state(self) -> RoadElementState:
+        return RoadElementState.from_lists(len(self.guide_points), *point_store.read(self.get_slots()))
+
+    def get_slots(self) -> list:
+        # Slots of the guide points followed by the connection points in point_store
+        return [point._slot for point in self.guide_points + self.connection_points]
+
+    def get_content_key(self):
+        # Hashable description of everything render draws, equal for road elements that look the same
+        # Coordinates are rounded to 0.001 mm, so points that only differ by float noise still match
+        points = [(*point.position, *point.direction) for point in self.guide_points + self.connection_points]
+        return (type(self), tuple(round(value, 3) for point in points for value in point), round(self.lane_marking_phase, 3))
+
+    def set_state(self, state):
+        # The state has to be valid, see solve_guide_point and solve_connection_point
+        history = self.get_edit_history()
+        is_recording = history is not None and history.is_recording
+        # Within a group only the first change of a road element needs the state before
+        previous_state = history.pack_state(self) if is_recording and not history.has_state(self) else None
+        if len(self.guide_points) != len(state.guide_points):
+            self.guide_points = [GuidePoint(self, position, direction) for position, direction in state.guide_points]
+        else:
+            for point, (position, direction) in zip(self.guide_points, state.guide_points):
+                point_store.set(point._slot, position, direction)
+        if len(self.connection_points) != len(state.connection_points):
+            self.connection_points = [ConnectionPoint(self, position, direction, border) for position, direction, border in state.connection_points]
+        else:
+            for point, values in zip(self.connection_points, state.connection_points):
+                point._set(*values)
+        self._restore()
+        self.invalidate()
+        if is_recording:
+            history.record_state(self, previous_state)
+
+    def get_track_graph(self):
+        # Graph of the track the road element is part of, None if it is not placed on a tile of a track
+        if self.tile is None or self.tile.track is None:
+            return None
+        return self.tile.track.graph
+
+    def get_edit_history(self):
+        # Undo history of the track the road element is part of, None if it is not placed on a tile of a track
+        if self.tile is None or self.tile.track is None:
+            return None
+        return self.tile.track.history
+
+    def invalidate(self):
+        self.version += 1
+        graph = self.get_track_graph()
+        if graph is not None:
+            graph.handle_geometry_changed(self)
+        if self.tile is not None and self.tile.track is not None:
+            self.tile.track.handle_chain_changed(self)
+            self.tile.track.handle_tile_changed(self.tile)
+
+    def _check_connection_point(self, index, position, direction):
+        # Validated (position, direction, border code) of a connection point, raises InvalidPositionError
+        if index < len(self.connection_points):
+            return self.connection_points[index].check_update(position, direction)
+        position = Vector2(round(position[0]), round(position[1]))
+        direction = Vector2(direction).normalize()
+        border = get_border_code(position, direction)
+        if border is None:
+            raise InvalidPositionError("Connection point is not on the border of the tile, or direction is invalid", position, None)
+        return position, direction, border
+
+    def _restore(self):
+        # Restore additional state of subclasses after loading the points
+        pass
@@ -0,0 +1,18 @@
+import math
+
+import numpy
+
+from track_generator.track.road_elements.corner_road import CornerRoad
+
+
+class ArcRoad(CornerRoad):
+    """Quarter circle around the corner of the tile, the distance of the connection points is the radius."""
+
+    type_name = "arc_road"
+    unit_length = math.pi / 2
+    unit_max_curvature = 1
+
+    def unit_curve(self, arc_lengths) -> numpy.ndarray:
+        # The center of the unit circle is the corner at (0, 1)
+        angles = numpy.asarray(arc_lengths, dtype=float)
+        return numpy.stack((numpy.sin(angles), 1 - numpy.cos(angles)), axis=1)
@@ -0,0 +1,39 @@
+import math
+
+import numpy
+
+from track_generator.track.road_elements.corner_road import CornerRoad
+
+# Clothoid with a length of 1 turning by 45 degrees, the curvature grows linearly from 0 to pi / 2
+# Sampled once with the trapezoidal rule, points in between are interpolated linearly
+_sample_count = 4097
+_arc_lengths = numpy.linspace(0, 1, _sample_count)
+_angles = math.pi / 4 * _arc_lengths ** 2
+_directions = numpy.stack((numpy.cos(_angles), numpy.sin(_angles)), axis=1)
+_steps = (_directions[1:] + _directions[:-1]) / 2 * numpy.diff(_arc_lengths)[:, None]
+_points = numpy.concatenate(([[0, 0]], numpy.cumsum(_steps, axis=0)))
+# The tangents at both ends of the symmetric curve meet at (x + y, 0) of its middle point, scale that to 1
+_size = _points[-1].sum()
+_points /= _size
+
+
+class ClothoidRoad(CornerRoad):
+    """Two mirrored clothoids around the corner of the tile.
+
+    The curvature grows linearly from the connection points to the middle, so the road joins straight roads
+    without a jump in curvature.
+    """
+
+    type_name = "clothoid_road"
+    unit_length = 2 / _size
+    unit_max_curvature = math.pi / 2 * _size
+
+    def unit_curve(self, arc_lengths) -> numpy.ndarray:
+        # The second half is the first one mirrored at the line through the middle point and the end of the tangents
+        arc_lengths = numpy.asarray(arc_lengths, dtype=float)
+        half_length = self.unit_length / 2
+        first_half = numpy.minimum(arc_lengths, self.unit_length - arc_lengths) / half_length
+        x = numpy.interp(first_half, _arc_lengths, _points[:, 0])
+        y = numpy.interp(first_half, _arc_lengths, _points[:, 1])
+        mirrored = arc_lengths > half_length
+        return numpy.stack((numpy.where(mirrored, 1 - y, x), numpy.where(mirrored, 1 - x, y)), axis=1)
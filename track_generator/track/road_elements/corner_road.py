@@ -0,0 +1,152 @@
+import math
+
+import numpy
+
+import track_generator.config as config
+import track_generator.regulations as regulations
+
+from track_generator.track.vector import Vector2
+from track_generator.track.road_element import RoadElement, RoadElementState
+from track_generator.track.lane_markings import draw_dashed_polyline
+from track_generator.track.points import GuidePoint
+from track_generator.track.geometry import border_vectors
+from track_generator.exceptions import InvalidPositionError, InvalidTrackError
+
+
+class CornerRoad(RoadElement):
+    """Road turning by 90 degrees around a corner of the tile, base of the curved road elements.
+
+    The connection points lie on two adjacent borders at the same distance from the corner between them
+    and point out of the tile perpendicular to their border. The guide point is the middle of the curve,
+    moving it or a connection point changes that distance.
+
+    Subclasses describe the curve for a distance of 1. It starts at the origin with heading (1, 0) and ends
+    at (1, 1) with heading (0, 1), the corner of the tile is at (0, 1).
+    """
+
+    # Length and maximum curvature of the unit curve
+    unit_length = None
+    unit_max_curvature = None
+
+    def __init__(self, entry_border=0, exit_border=1, distance=config.tile_size / 2):
+        super().__init__()
+        if (entry_border - exit_border) % 2 == 0:
+            raise ValueError("Corner roads connect two adjacent borders")
+        self.update_state(self._solve_distance(distance, (entry_border, exit_border)))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__} with guide points {self.guide_points} and connection points {self.connection_points}"
+
+    def unit_curve(self, arc_lengths) -> numpy.ndarray:
+        # Points of the unit curve at the arc lengths, (n, 2) array
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def render(self, surface, scale=1, offset=(0, 0)):
+        import pygame
+        centerline = self.get_centerline(scale)
+        points = centerline * scale + numpy.asarray(offset, dtype=float)
+        normals = _get_normals(centerline)
+        color = config.color_lane_marking
+        line_width = max(1, round(regulations.lane_marking_line_width * scale))
+        lane_width = max(1, round(regulations.lane_width * scale))
+        # Same layout as StraightRoad, the outer lines are what is left of the wider band
+        for half_width, band_color in ((lane_width + line_width, color), (lane_width, config.color_road)):
+            outline = numpy.concatenate((points + half_width * normals, (points - half_width * normals)[::-1]))
+            pygame.draw.polygon(surface, band_color, outline.tolist())
+        draw_dashed_polyline(surface, color, centerline, regulations.lane_marking_line_width, phase=self.lane_marking_phase, scale=scale, offset=offset)
+
+    def get_length(self):
+        return self.unit_length * self.distance
+
+    def get_centerline(self, scale=1) -> numpy.ndarray:
+        # Tessellation for the next finer power of two of the scale, cached until the geometry changes
+        lod_scale = 2 ** math.ceil(math.log2(scale))
+        if self._centerline_version != self.version:
+            self._centerlines = {}
+            self._centerline_version = self.version
+        centerline = self._centerlines.get(lod_scale)
+        if centerline is None:
+            centerline = self._centerlines[lod_scale] = self._tessellate(config.centerline_tolerance / lod_scale)
+        return centerline
+
+    def solve_guide_point(self, index, position, direction=None) -> RoadElementState:
+        # The direction follows from the curve, only the distance of the guide point from the corner is used
+        if index != 0:
+            raise ValueError(f"{type(self).__name__} only has one guide point")
+        middle_distance = Vector2(*self.unit_curve([self.unit_length / 2])[0]).distance_to((0, 1))
+        distance = Vector2(position).distance_to(self._get_corner()) / middle_distance
+        return self._solve_distance(distance, self._get_borders())
+
+    def solve_connection_point(self, index, position, direction=None) -> RoadElementState:
+        borders = self._get_borders()
+        if direction is not None and not _is_close(Vector2(direction).normalize(), border_vectors[borders[index]]):
+            raise InvalidTrackError(f"{type(self).__name__} can only be connected perpendicular to the border", self.connection_points[index])
+        # The position is projected onto the border of the connection point
+        distance = (Vector2(position) - self._get_corner()).dot(_along_border(index, borders))
+        return self._solve_distance(distance, borders)
+
+    def _solve_distance(self, distance, borders) -> RoadElementState:
+        # The inner edge of the road folds over itself once the radius of the curve is smaller than half the road width
+        distance = round(distance)
+        min_distance = math.ceil((regulations.lane_width + regulations.lane_marking_line_width) * self.unit_max_curvature)
+        if not min_distance <= distance <= config.tile_size:
+            raise InvalidTrackError(f"Distance of the connection points from the corner must be between {min_distance} and {config.tile_size} mm",
+                                    self.guide_points[0] if self.guide_points else None)
+        corner = _get_corner(borders)
+        positions = [corner + distance * _along_border(index, borders) for index in range(2)]
+        middle = Vector2(*_transform(self.unit_curve([self.unit_length / 2]) * distance, positions[0], borders)[0])
+        middle_direction = (Vector2(border_vectors[borders[1]]) - Vector2(border_vectors[borders[0]])).normalize()
+        try:
+            connection_points = [self._check_connection_point(index, positions[index], border_vectors[borders[index]]) for index in range(2)]
+        except InvalidPositionError as e:
+            raise InvalidTrackError(e, GuidePoint(None, middle, middle_direction))
+        return RoadElementState([(middle, middle_direction)], connection_points)
+
+    def _restore(self):
+        self.distance = self.connection_points[0].position.distance_to(self._get_corner())
+        self._centerlines = {}
+        self._centerline_version = None
+
+    def _get_borders(self) -> tuple:
+        return tuple(point.get_border_code() for point in self.connection_points)
+
+    def _get_corner(self) -> Vector2:
+        return _get_corner(self._get_borders())
+
+    def _tessellate(self, tolerance) -> numpy.ndarray:
+        # Segments are short enough that no chord deviates more than the tolerance from the curve
+        segment_length = math.sqrt(8 * tolerance * self.distance / self.unit_max_curvature)
+        segment_count = min(config.centerline_max_segments, max(2, math.ceil(self.get_length() / segment_length)))
+        arc_lengths = numpy.linspace(0, self.unit_length, segment_count + 1)
+        return _transform(self.unit_curve(arc_lengths) * self.distance, self.connection_points[0].position, self._get_borders())
+
+
+def _transform(points, start, borders) -> numpy.ndarray:
+    # Scaled unit curve coordinates to tile coordinates
+    # The curve enters against the direction of the first connection point and leaves along the second one
+    heading = -numpy.asarray(border_vectors[borders[0]], dtype=float)
+    side = numpy.asarray(border_vectors[borders[1]], dtype=float)
+    return numpy.asarray(tuple(start), dtype=float) + points[:, :1] * heading + points[:, 1:] * side
+
+
+def _get_corner(borders) -> Vector2:
+    # Corner of the tile between two adjacent borders
+    x = config.tile_size if 2 in borders else 0
+    y = config.tile_size if 3 in borders else 0
+    return Vector2(x, y)
+
+
+def _along_border(index, borders) -> Vector2:
+    # Direction along the border of the connection point away from the corner, the inward normal of the other border
+    return -Vector2(border_vectors[borders[1 - index]])
+
+
+def _get_normals(points) -> numpy.ndarray:
+    # Unit normals of a polyline from the tangents at its points
+    tangents = numpy.gradient(points, axis=0)
+    tangents /= numpy.linalg.norm(tangents, axis=1, keepdims=True)
+    return numpy.stack((-tangents[:, 1], tangents[:, 0]), axis=1)
+
+
+def _is_close(vector_a, vector_b, tolerance=1e-6) -> bool:
+    return abs(vector_a[0] - vector_b[0]) <= tolerance and abs(vector_a[1] - vector_b[1]) <= tolerance
@@ -1,18 +1,25 @@
-import pygame
-import pygame.gfxdraw
 import math
+
 import numpy
 
 import track_generator.config as config
 import track_generator.regulations as regulations
 
-from track_generator.track.road_element import RoadElement
-from track_generator.track.points import TrackPoint, GuidePoint, ConnectionPoint
+from track_generator.track.vector import Vector2
+from track_generator.track.road_element import RoadElement, RoadElementState
+from track_generator.track.lane_markings import draw_dashed_polyline
+from track_generator.track.points import GuidePoint, get_border_code
 from track_generator.exceptions import InvalidPositionError, InvalidTrackError
-from pip._vendor.rich import color
+
+
+def _is_inside_tile(position) -> bool:
+    # Tile area including the borders
+    return 0 <= position[0] < config.tile_size + 1 and 0 <= position[1] < config.tile_size + 1
 
 
 class StraightRoad(RoadElement):
+
+    type_name = "straight_road"
     
     def __init__(self, guide_point=None, connection_points=[]):
         super().__init__()
@@ -27,48 +34,47 @@ class StraightRoad(RoadElement):
     def __repr__(self) -> str:
         return f"Straight Road with guide points {self.guide_points} and connection points {self.connection_points}"
     
-    def render(self, surface):
-        pos_a = self.connection_points[0].position
-        pos_b = self.connection_points[1].position
+    def render(self, surface, scale=1, offset=(0, 0)):
+        import pygame
+        # Positions and widths are given in mm and drawn directly at the target resolution
+        pos_a = self.connection_points[0].position * scale + Vector2(offset)
+        pos_b = self.connection_points[1].position * scale + Vector2(offset)
         color = config.color_lane_marking
-        line_width = regulations.lane_marking_line_width
-        lane_width = regulations.lane_width
+        line_width = max(1, round(regulations.lane_marking_line_width * scale))
+        lane_width = max(1, round(regulations.lane_width * scale))
         pygame.draw.line(surface, color, pos_a, pos_b, 2 * (lane_width + line_width))
         pygame.draw.line(surface, config.color_road, pos_a, pos_b, 2 * lane_width)
-        # pygame.draw.line(surface, color, pos_a, pos_b, line_width)
-        self._draw_line_dashed(surface, color, pos_a, pos_b, line_width, regulations.lane_marking_dash_length)
+        draw_dashed_polyline(surface, color, self.get_centerline(scale), regulations.lane_marking_line_width, phase=self.lane_marking_phase, scale=scale, offset=offset)
 
-    def update_guide_point(self, index, position, direction=None):
+    def get_length(self):
+        return self.connection_points[0].position.distance_to(self.connection_points[1].position)
+
+    def get_centerline(self, scale=1):
+        return numpy.array([tuple(self.connection_points[0].position), tuple(self.connection_points[1].position)])
+
+    def solve_guide_point(self, index, position, direction=None):
         if index != 0:
             raise ValueError("Straight road only has one guide point")
-        self._update_guide_point(position, direction)
-        
-    def update_connection_point(self, index, position, direction=None):
-        self._update_connection_point(index, position, direction)
-        
-    def _update_guide_point(self, position, direction):
         if direction is None:
             direction = self.road_direction
         position = self._restrict_position_to_selected_tile(position)
-        new_connection_points = self._border_intersection_from_point(GuidePoint(self, position, direction))
+        direction = Vector2(direction).normalize()
+        new_connection_points = self._border_intersection_from_point(position, direction)
+        try:
+            connection_points = [self._check_connection_point(i, *point) for i, point in enumerate(new_connection_points)]
+        except InvalidPositionError as e:
+            raise InvalidTrackError(e, GuidePoint(None, position, direction))
+        return RoadElementState([(position, direction)], connection_points)
         
-        if len(self.guide_points) == 0:
-            self.guide_points.append(GuidePoint(self, position, direction))
-            self.connection_points = new_connection_points
-        else:
-            self.connection_points[0].update(new_connection_points[0].position, new_connection_points[0].direction)
-            self.connection_points[1].update(new_connection_points[1].position, new_connection_points[1].direction)
-            self.guide_points[0].update(position, direction) 
-        self.road_direction = direction
-
-    def _update_connection_point(self, index, position, direction):
-        position = pygame.Vector2(position)
+    def solve_connection_point(self, index, position, direction=None):
+        position = Vector2(position)
         # Move the guidepoint to the new centerline while keeping the ratio between the connection points
         center_line_length = self.connection_points[0].position.distance_to(self.connection_points[1].position)
         distance_to_guide_point = self.connection_points[0].position.distance_to(self.guide_points[0].position)
         guide_point_ratio = distance_to_guide_point / center_line_length
         guide_point_ratio = max(0.1, min(0.9, guide_point_ratio))
         
+        connection_points = [None, None]
         try:
             if direction is None:
                 # Fix the position of the opposite connection point 
@@ -76,94 +82,86 @@ class StraightRoad(RoadElement):
                 # Calculate new position on the border if the point lies outside the tile
                 position = self._restrict_position_to_selected_tile(position, unchanged_point)
                 # New road direction will be the direction from the unchanged point to the new point
-                direction = pygame.Vector2(position - unchanged_point.position).normalize()
-                new_point = self._border_intersection_from_point(GuidePoint(self, unchanged_point.position, direction))[1]
-                self.connection_points[1 - index].direction = -new_point.direction
-                self.connection_points[index].update(new_point.position, new_point.direction)
+                direction = Vector2(position - unchanged_point.position).normalize()
+                new_position, new_direction = self._border_intersection_from_point(unchanged_point.position, direction)[1]
+                connection_points[1 - index] = self._check_connection_point(1 - index, unchanged_point.position, -new_direction)
+                connection_points[index] = self._check_connection_point(index, new_position, new_direction)
                 
             else:
-                direction = pygame.Vector2(direction).normalize()
+                direction = Vector2(direction).normalize()
                 position = self._restrict_position_to_selected_tile(position, self.connection_points[1 - index])
-                new_point = self._border_intersection_from_point(GuidePoint(self, position, -direction))[1]
-                self.connection_points[1 - index].update(new_point.position, new_point.direction)  #
-                self.connection_points[index].update(position, direction)
-            
-            self.road_direction = self.connection_points[1].direction
-            guide_point_position = self.connection_points[0].position + guide_point_ratio * (self.connection_points[1].position - self.connection_points[0].position)
-            self.guide_points[0].update(guide_point_position, self.road_direction)
+                new_position, new_direction = self._border_intersection_from_point(position, -direction)[1]
+                connection_points[1 - index] = self._check_connection_point(1 - index, new_position, new_direction)
+                connection_points[index] = self._check_connection_point(index, position, direction)
         except InvalidPositionError as e:
             raise InvalidTrackError(e, self.guide_points[0])
-    
+        
+        road_direction = connection_points[1][1]
+        guide_point_position = connection_points[0][0] + guide_point_ratio * (connection_points[1][0] - connection_points[0][0])
+        return RoadElementState([(guide_point_position, road_direction)], connection_points)
+        
+    def _restore(self):
+        self.road_direction = self.connection_points[1].direction
+
     # Restrict the position of a point to the tile borders
     # A line is drawn from position to the guide point
     # The intersection of the line with the tile borders determines the new position of the point
-    def _restrict_position_to_selected_tile(self, position, guide_point=None) -> pygame.Vector2:
+    def _restrict_position_to_selected_tile(self, position, guide_point=None) -> Vector2:
         # If the position is inside the tile, return
-        position = pygame.Vector2(position)
-        if pygame.Rect(0, 0, config.tile_size + 1, config.tile_size + 1).collidepoint(position):
+        position = Vector2(position)
+        if _is_inside_tile(position):
             return position
         if guide_point is None:
             # Point in the center of the tile
-            guide_position = pygame.Vector2(config.tile_size / 2, config.tile_size / 2)
+            guide_position = Vector2(config.tile_size / 2, config.tile_size / 2)
         else:
             guide_position = guide_point.position
         direction = (position - guide_position).normalize()
-        return self._border_intersection_from_point(GuidePoint(None, guide_position, direction))[1].position      
+        return self._border_intersection_from_point(guide_position, direction)[1][0]
         
-    def _distance_from_point_to_borders(self, point: TrackPoint, border_rect: pygame.Rect):
-        # Normalize the direction vector
-        direction = point.direction.normalize()
-        distance_right = (border_rect.right - point.position.x) / direction.x if direction.x != 0 else math.inf
-        distance_top = (border_rect.top - point.position.y) / direction.y if direction.y != 0 else math.inf
-        distance_left = (border_rect.left - point.position.x) / direction.x if direction.x != 0 else math.inf
-        distance_bottom = (border_rect.bottom - point.position.y) / direction.y if direction.y != 0 else math.inf
+    def _distance_from_point_to_borders(self, position, direction):
+        # Distances to the right, top, left and bottom border, the direction has to be normalized
+        distance_right = (config.tile_size - position.x) / direction.x if direction.x != 0 else math.inf
+        distance_top = -position.y / direction.y if direction.y != 0 else math.inf
+        distance_left = -position.x / direction.x if direction.x != 0 else math.inf
+        distance_bottom = (config.tile_size - position.y) / direction.y if direction.y != 0 else math.inf
         return distance_right, distance_top, distance_left, distance_bottom
         
-    def _border_intersection_from_point(self, point: TrackPoint) -> tuple[ConnectionPoint, ConnectionPoint]:
-        position = point.position
-        direction = point.direction
-        distances = self._distance_from_point_to_borders(point, pygame.Rect(0, 0, config.tile_size, config.tile_size))
+    def _point_on_border(self, position, direction, distance, border_index) -> Vector2:
+        # Snap the intersection exactly onto the border, border_index as returned by _distance_from_point_to_borders
+        point = Vector2(position.x + distance * direction.x, position.y + distance * direction.y)
+        if border_index % 2 == 0:
+            point.x = config.tile_size if border_index == 0 else 0
+        else:
+            point.y = 0 if border_index == 1 else config.tile_size
+        return point
+        
+    def _border_intersection_from_point(self, position: Vector2, direction: Vector2):
+        # Returns the (position, direction) of the back and front intersection with the tile borders
+        # A vectorized version for many points is geometry.border_intersections
+        distances = border_distances = self._distance_from_point_to_borders(position, direction)
         
         # If the point lies within the tile, point 1 has the smallest positive distance
         # Guide point 0 lies on the border in the opposite direction
-        if pygame.Rect(0, 0, config.tile_size + 1, config.tile_size + 1).collidepoint(position):
-            distance_front = min(d for d in distances if d > 0)
-            distance_back = -min(-d for d in distances if d <= 0)
+        if _is_inside_tile(position):
+            distance_front = min((d for d in distances if d > 0), default=math.inf)
+            distance_back = -min((-d for d in distances if d <= 0), default=math.inf)
         # If the point is at the height or width of the tile, point 0 is the one with the smallest distance
-        elif 0 <= point.position.x <= config.tile_size or 0 <= point.position.y <= config.tile_size:
-            distance_back = min(d for d in distances if d > 0)
-            distance_front = min(d for d in distances if d >= 0 and d != distance_back)
+        elif 0 <= position.x <= config.tile_size or 0 <= position.y <= config.tile_size:
+            distance_back = min((d for d in distances if d > 0), default=math.inf)
+            distance_front = min((d for d in distances if d >= 0 and d != distance_back), default=math.inf)
         # Ignore the point with the smallest distance since it is not at the height or width of the tile
         else:
             distances = [d for d in distances if d != min(distances)]
-            distance_back = min(d for d in distances if d > 0)
-            distance_front = min(d for d in distances if d >= 0 and d != distance_back)
+            distance_back = min((d for d in distances if d > 0), default=math.inf)
+            distance_front = min((d for d in distances if d >= 0 and d != distance_back), default=math.inf)
+        if math.isinf(distance_front) or math.isinf(distance_back):
+            raise InvalidTrackError("Could not find an intersection with any of the tile borders", GuidePoint(None, position, direction))
         
-        # An InvalidPositionError is raised if there is no intersection with the tile
-        try: 
-            point_front = ConnectionPoint(self, (position.x + distance_front * direction.x, position.y + distance_front * direction.y), direction)
-            point_back = ConnectionPoint(self, (position.x + distance_back * direction.x, position.y + distance_back * direction.y), -direction)
-        except InvalidPositionError as e:
-            string = f"Could not find an intersection with any of the tile borders:", e
-            raise InvalidTrackError(string, point)
+        position_front = self._point_on_border(position, direction, distance_front, border_distances.index(distance_front))
+        position_back = self._point_on_border(position, direction, distance_back, border_distances.index(distance_back))
+        # There is no intersection with the tile if the points are not on a border
+        if get_border_code(position_front, direction) is None or get_border_code(position_back, -direction) is None:
+            raise InvalidTrackError("Could not find an intersection with any of the tile borders", GuidePoint(None, position, direction))
         
-        return point_back, point_front
-    
-    def _draw_line_dashed(self, surface, color, start_pos, end_pos, width = 1, dash_length = 10, exclude_corners = True):
-        # convert tuples to numpy arrays
-        start_pos = numpy.array(start_pos)
-        end_pos   = numpy.array(end_pos)
-
-        # get euclidian distance between start_pos and end_pos
-        length = numpy.linalg.norm(end_pos - start_pos)
-
-        # get amount of pieces that line will be split up in (half of it are amount of dashes)
-        dash_amount = int(length / dash_length)
-
-        # x-y-value-pairs of where dashes start (and on next, will end)
-        dash_knots = numpy.array([numpy.linspace(start_pos[i], end_pos[i], dash_amount) for i in range(2)]).transpose()
-        
-        for n in range(int(exclude_corners), dash_amount - int(exclude_corners) - 1, 2):
-            pygame.draw.line(surface, color, tuple(dash_knots[n]), tuple(dash_knots[n+1]), width)
-
-    
+        return (position_back, -direction), (position_front, direction)
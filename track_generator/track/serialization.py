@@ -0,0 +1,303 @@
+import json
+import struct
+
+import numpy
+
+import track_generator.config as config
+from track_generator.track.track import Track
+from track_generator.track.point_store import point_store
+from track_generator.track.geometry import border_vectors, border_codes, mirrored_positions
+from track_generator.track.road_elements.straight_road import StraightRoad
+from track_generator.track.road_elements.arc_road import ArcRoad
+from track_generator.track.road_elements.clothoid_road import ClothoidRoad
+from track_generator.exceptions import InvalidTrackError
+
+road_element_types = {road_element_type.type_name: road_element_type for road_element_type in [StraightRoad, ArcRoad, ClothoidRoad]}
+
+file_format = "caudri-track"
+file_version = 1
+
+# Binary layout: magic, version, tile size, number of tiles, guide points, connection points and twins
+_binary_magic = b'CTRK'
+_binary_header = struct.Struct('<4sHIIIII')
+_no_road_element = 255
+
+
+class TrackData:
+    """Flat array representation of a track, shared by the JSON and binary formats."""
+
+    def __init__(self, grid_positions, type_names, road_element_types, guide_point_counts, guide_points,
+                 connection_point_counts, connection_points, twins):
+        self.grid_positions = grid_positions                    # (tiles, 2) int
+        self.type_names = type_names                            # Names referenced by road_element_types
+        self.road_element_types = road_element_types            # (tiles,) int, index into type_names
+        self.guide_point_counts = guide_point_counts            # (tiles,) int
+        self.guide_points = guide_points                        # (guide points, 4) float, position and direction
+        self.connection_point_counts = connection_point_counts  # (tiles,) int
+        self.connection_points = connection_points              # (connection points, 4) float, position and direction
+        self.twins = twins                                      # (twins, 2) int, indices of twinned connection points
+
+
+def save_track(track: Track, path) -> None:
+    # The format is chosen by the file extension, .json is human-readable, everything else is binary
+    if str(path).endswith('.json'):
+        with open(path, 'w') as file:
+            json.dump(track_to_dict(track), file, indent=2)
+    else:
+        with open(path, 'wb') as file:
+            file.write(track_to_bytes(track))
+
+
+def load_track(path) -> Track:
+    if str(path).endswith('.json'):
+        with open(path) as file:
+            return track_from_dict(json.load(file))
+    with open(path, 'rb') as file:
+        return track_from_bytes(file.read())
+
+
+def track_to_dict(track: Track) -> dict:
+    track_data = get_track_data(track)
+    guide_points = track_data.guide_points.tolist()
+    connection_points = track_data.connection_points.tolist()
+    tiles = []
+    point_addresses = []  # (tile index, point index) of every connection point
+    guide_index = connection_index = 0
+    for tile_index, (grid_position, element_type, guide_count, connection_count) in enumerate(zip(
+            track_data.grid_positions.tolist(), track_data.road_element_types.tolist(),
+            track_data.guide_point_counts.tolist(), track_data.connection_point_counts.tolist())):
+        road_element = None
+        if element_type != _no_road_element:
+            road_element = {
+                "type": track_data.type_names[element_type],
+                "guide_points": [_point_to_dict(point) for point in guide_points[guide_index:guide_index + guide_count]],
+                "connection_points": [_point_to_dict(point) for point in connection_points[connection_index:connection_index + connection_count]],
+            }
+        tiles.append({"grid_position": grid_position, "road_element": road_element})
+        point_addresses.extend([tile_index, point_index] for point_index in range(connection_count))
+        guide_index += guide_count
+        connection_index += connection_count
+
+    twins = [[point_addresses[index_a], point_addresses[index_b]] for index_a, index_b in track_data.twins.tolist()]
+    return {"format": file_format, "version": file_version, "tile_size": config.tile_size, "tiles": tiles, "twins": twins}
+
+
+def track_from_dict(track_dict: dict) -> Track:
+    _check_header(track_dict.get("format"), track_dict.get("version"), track_dict.get("tile_size"))
+    type_names = list(road_element_types)
+    grid_positions, element_types, guide_point_counts, connection_point_counts = [], [], [], []
+    guide_points, connection_points = [], []
+    for tile_dict in track_dict["tiles"]:
+        grid_positions.append(tile_dict["grid_position"])
+        road_element = tile_dict.get("road_element")
+        if road_element is None:
+            element_types.append(_no_road_element)
+            guide_point_counts.append(0)
+            connection_point_counts.append(0)
+            continue
+        if road_element["type"] not in road_element_types:
+            raise InvalidTrackError(f"Unknown road element type {road_element['type']}", tile_dict["grid_position"])
+        element_types.append(type_names.index(road_element["type"]))
+        guide_point_counts.append(len(road_element["guide_points"]))
+        connection_point_counts.append(len(road_element["connection_points"]))
+        guide_points.extend(point["position"] + point["direction"] for point in road_element["guide_points"])
+        connection_points.extend(point["position"] + point["direction"] for point in road_element["connection_points"])
+
+    # Twins reference (tile index, point index) pairs, convert them to global connection point indices
+    first_point_index = numpy.concatenate(([0], numpy.cumsum(connection_point_counts)[:-1])).astype(numpy.int64)
+    twins = numpy.array(track_dict["twins"], dtype=numpy.int64).reshape(-1, 2, 2)
+    twins = first_point_index[twins[:, :, 0]] + twins[:, :, 1]
+
+    track_data = TrackData(numpy.array(grid_positions, dtype=numpy.int64).reshape(-1, 2), type_names,
+                           numpy.array(element_types), numpy.array(guide_point_counts), numpy.array(guide_points, dtype=float).reshape(-1, 4),
+                           numpy.array(connection_point_counts), numpy.array(connection_points, dtype=float).reshape(-1, 4), twins)
+    return build_track(track_data)
+
+
+def track_to_bytes(track: Track) -> bytes:
+    return track_data_to_bytes(get_track_data(track))
+
+
+def track_from_bytes(data: bytes) -> Track:
+    return build_track(track_data_from_bytes(data))
+
+
+def track_data_to_bytes(track_data: TrackData) -> bytes:
+    type_names = ','.join(track_data.type_names).encode()
+    header = _binary_header.pack(_binary_magic, file_version, config.tile_size, len(track_data.grid_positions),
+                                 len(track_data.guide_points), len(track_data.connection_points), len(track_data.twins))
+    return b''.join([
+        header,
+        struct.pack('<H', len(type_names)), type_names,
+        track_data.grid_positions.astype('<i4').tobytes(),
+        track_data.road_element_types.astype('u1').tobytes(),
+        track_data.guide_point_counts.astype('u1').tobytes(),
+        track_data.connection_point_counts.astype('u1').tobytes(),
+        track_data.guide_points.astype('<f8').tobytes(),
+        track_data.connection_points.astype('<f8').tobytes(),
+        track_data.twins.astype('<i4').tobytes(),
+    ])
+
+
+def track_data_from_bytes(data: bytes) -> TrackData:
+    magic, version, tile_size, tile_count, guide_count, connection_count, twin_count = _binary_header.unpack_from(data)
+    if magic != _binary_magic:
+        raise InvalidTrackError("Not a track file", magic)
+    _check_header(file_format, version, tile_size)
+    offset = _binary_header.size
+    (names_length,) = struct.unpack_from('<H', data, offset)
+    offset += 2
+    type_names = data[offset:offset + names_length].decode().split(',')
+    offset += names_length
+
+    def read_array(dtype, count, columns=None):
+        nonlocal offset
+        array = numpy.frombuffer(data, dtype, count * (columns or 1), offset)
+        offset += array.nbytes
+        return array.reshape(-1, columns) if columns else array
+
+    track_data = TrackData(read_array('<i4', tile_count, 2), type_names, read_array('u1', tile_count),
+                           read_array('u1', tile_count), None, read_array('u1', tile_count), None, None)
+    track_data.guide_points = read_array('<f8', guide_count, 4)
+    track_data.connection_points = read_array('<f8', connection_count, 4)
+    track_data.twins = read_array('<i4', twin_count, 2)
+    # Like track_from_dict, every road element type used by a tile has to be known
+    for element_type in numpy.unique(track_data.road_element_types).tolist():
+        if element_type == _no_road_element:
+            continue
+        if element_type >= len(type_names):
+            raise InvalidTrackError(f"Unknown road element type index {element_type}", type_names)
+        if type_names[element_type] not in road_element_types:
+            raise InvalidTrackError(f"Unknown road element type {type_names[element_type]}", type_names)
+    return track_data
+
+
+def get_track_data(track: Track, tiles=None) -> TrackData:
+    # By default the whole track, chunks that are paged out are loaded first
+    # Only twins between the given tiles are stored
+    if tiles is None:
+        track.load_all_chunks()
+        tiles = track.tiles
+    type_names = list(road_element_types)
+    grid_positions, element_types, guide_point_counts, connection_point_counts = [], [], [], []
+    guide_slots, connection_slots = [], []
+    for tile in tiles:
+        grid_positions.append(tile.grid_position)
+        road_element = tile.road_element
+        if road_element is None:
+            element_types.append(_no_road_element)
+            guide_point_counts.append(0)
+            connection_point_counts.append(0)
+            continue
+        element_types.append(type_names.index(road_element.type_name))
+        guide_point_counts.append(len(road_element.guide_points))
+        connection_point_counts.append(len(road_element.connection_points))
+        guide_slots.extend(point.get_slot() for point in road_element.guide_points)
+        connection_slots.extend(point.get_slot() for point in road_element.connection_points)
+
+    # Coordinates and twins are read from the point store without touching the point objects
+    guide_slots = numpy.array(guide_slots, dtype=numpy.int64)
+    connection_slots = numpy.array(connection_slots, dtype=numpy.int64)
+    guide_points = numpy.hstack((point_store.positions[guide_slots], point_store.directions[guide_slots]))
+    connection_points = numpy.hstack((point_store.positions[connection_slots], point_store.directions[connection_slots]))
+    connection_indices = numpy.full(len(point_store), -1, dtype=numpy.int64)
+    connection_indices[connection_slots] = numpy.arange(len(connection_slots))
+    twin_slots = point_store.twins[connection_slots]
+    twin_indices = numpy.where(twin_slots >= 0, connection_indices[twin_slots], -1)
+    # Store every pair once, twins outside of the track are ignored
+    first = numpy.flatnonzero(twin_indices > numpy.arange(len(connection_slots)))
+    twins = numpy.stack((first, twin_indices[first]), axis=1)
+
+    return TrackData(numpy.array(grid_positions, dtype=numpy.int64).reshape(-1, 2), type_names, numpy.array(element_types),
+                     numpy.array(guide_point_counts), guide_points, numpy.array(connection_point_counts), connection_points, twins)
+
+
+def build_track(track_data: TrackData) -> Track:
+    track = Track()
+    for grid_position, road_element in zip(track_data.grid_positions.tolist(), build_road_elements(track_data)):
+        track.add_tile(tuple(grid_position), road_element)
+    return track
+
+
+def build_road_elements(track_data: TrackData) -> list:
+    # Validate all borders and twins at once, then create the objects without solving any geometry
+    # Returns the road element of every tile, None for empty tiles, twins are already linked
+    connection_tiles = numpy.repeat(numpy.arange(len(track_data.grid_positions)), track_data.connection_point_counts)
+    borders = _validate_borders(track_data.connection_points)
+    _validate_twins(track_data, connection_tiles, borders)
+
+    road_elements = []
+    connection_point_objects = []
+    guide_points = track_data.guide_points.tolist()
+    connection_points = track_data.connection_points.tolist()
+    border_list = borders.tolist()
+    guide_index = connection_index = 0
+    for element_type, guide_count, connection_count in zip(track_data.road_element_types.tolist(), track_data.guide_point_counts.tolist(),
+                                                           track_data.connection_point_counts.tolist()):
+        road_element = None
+        if element_type != _no_road_element:
+            road_element_type = road_element_types[track_data.type_names[element_type]]
+            road_element = road_element_type.from_points(
+                [(point[:2], point[2:]) for point in guide_points[guide_index:guide_index + guide_count]],
+                [(point[:2], point[2:], border) for point, border in zip(connection_points[connection_index:connection_index + connection_count],
+                                                                         border_list[connection_index:connection_index + connection_count])])
+            connection_point_objects.extend(road_element.connection_points)
+        guide_index += guide_count
+        connection_index += connection_count
+        road_elements.append(road_element)
+
+    # Link all twins in bulk instead of replaying set_twin, the track graph picks them up when the tiles are added
+    for index_a, index_b in track_data.twins.tolist():
+        point_a, point_b = connection_point_objects[index_a], connection_point_objects[index_b]
+        point_a.twin = point_b
+        point_b.twin = point_a
+        point_a.fix_to_border()
+        point_b.fix_to_border()
+    return road_elements
+
+
+def _validate_borders(connection_points) -> numpy.ndarray:
+    # Border code of every connection point, see geometry.border_vectors
+    borders = border_codes(connection_points[:, :2], connection_points[:, 2:])
+    invalid = numpy.flatnonzero(borders < 0)
+    if len(invalid):
+        raise InvalidTrackError("Connection point is not on the border of the tile, or direction is invalid", connection_points[invalid[0]].tolist())
+    return borders
+
+
+def _validate_twins(track_data: TrackData, connection_tiles, borders) -> None:
+    twins = track_data.twins
+    if len(twins) == 0:
+        return
+    if twins.min() < 0 or twins.max() >= len(track_data.connection_points):
+        raise InvalidTrackError("Twin references a connection point that does not exist", int(twins.max()))
+    point_indices, twin_counts = numpy.unique(twins, return_counts=True)
+    if numpy.any(twin_counts > 1):
+        raise InvalidTrackError("Connection point has more than one twin", int(point_indices[twin_counts > 1][0]))
+    point_a, point_b = track_data.connection_points[twins[:, 0]], track_data.connection_points[twins[:, 1]]
+    border_a, border_b = borders[twins[:, 0]], borders[twins[:, 1]]
+
+    # Twins lie on opposite borders of adjacent tiles
+    adjacent = numpy.all(track_data.grid_positions[connection_tiles[twins[:, 0]]] + border_vectors[border_a]
+                         == track_data.grid_positions[connection_tiles[twins[:, 1]]], axis=1)
+    opposite = (border_a + 2) % 4 == border_b
+    # Mirrored positions agree and the directions are reversed
+    matching = numpy.all(numpy.isclose(mirrored_positions(point_a[:, :2], border_a), point_b[:, :2]), axis=1) & numpy.all(numpy.isclose(point_a[:, 2:], -point_b[:, 2:]), axis=1)
+
+    invalid = numpy.flatnonzero(~(adjacent & opposite & matching))
+    if len(invalid):
+        raise InvalidTrackError("Twinned connection points do not match", twins[invalid[0]].tolist())
+
+
+def _check_header(format_name, version, tile_size) -> None:
+    if format_name != file_format:
+        raise InvalidTrackError("Not a track file", format_name)
+    if version != file_version:
+        raise InvalidTrackError(f"Unsupported track file version {version}", version)
+    if tile_size != config.tile_size:
+        raise InvalidTrackError(f"Track was saved with tile size {tile_size}, but the configured tile size is {config.tile_size}", tile_size)
+
+
+def _point_to_dict(point) -> dict:
+    # Point is a [x, y, direction x, direction y] list
+    return {"position": point[:2], "direction": point[2:]}
@@ -1,4 +1,3 @@
-import pygame
 import track_generator.config as config
 
 
@@ -6,13 +5,41 @@ class Tile:
 
     def __init__(self, grid_position, road_element=None):
         self.set_grid_position(grid_position)
+        # Set by Track.add_tile
+        self.track = None
+        self._road_element = None
         self.road_element = road_element
-        
-        self.tile_surface = pygame.Surface((config.tile_size, config.tile_size))
-                
+        # Content key of the road element and the render key it was computed for, see get_content_key
+        self._content_key = None
+        self._content_render_key = None
+
     def __repr__(self):
         return f"Tile at {self.grid_position} with road element {self.road_element}"
-    
+
+    @property
+    def road_element(self):
+        return self._road_element
+
+    @road_element.setter
+    def road_element(self, road_element):
+        graph = self.track.graph if self.track is not None else None
+        if self._road_element is not None:
+            if self.track is not None:
+                # The twins of the removed road element are the ends of the remaining chains
+                self.track.handle_chain_changed(self._road_element)
+            self._road_element.tile = None
+            if graph is not None:
+                graph.remove_road_element(self._road_element)
+        self._road_element = road_element
+        if road_element is not None:
+            road_element.tile = self
+            if graph is not None:
+                graph.add_road_element(road_element)
+        if self.track is not None:
+            if road_element is not None:
+                self.track.handle_chain_changed(road_element)
+            self.track.handle_tile_changed(self)
+
     @property
     def x(self):
         return self.grid_position[0]
@@ -24,13 +51,27 @@ class Tile:
     def set_grid_position(self, grid_position):
         if not isinstance(grid_position, tuple) or len(grid_position) != 2:
             raise ValueError("Grid position must be an integer tuple")
-        if grid_position[0] < 0 or grid_position[1] < 0:
-            raise ValueError("Grid position must be positive")
         self.grid_position = grid_position
-        
-    def render(self) -> pygame.Surface:
-        self.tile_surface.fill(config.color_road)
+
+    def invalidate(self):
+        self._content_render_key = None
+
+    def draw(self, surface, scale=1) -> None:
+        # Draw the tile into the top left corner of the surface
+        surface.fill(config.color_road)
         if self.road_element:
-            self.road_element.render(self.tile_surface)
-        return self.tile_surface
-        
+            self.road_element.render(surface, scale)
+
+    def get_render_key(self):
+        # Changes whenever the rendered tile would look different
+        if self.road_element is None:
+            return (None, 0)
+        return (id(self.road_element), self.road_element.version, self.road_element.lane_marking_phase)
+
+    def get_content_key(self):
+        # Equal for all tiles that look the same, used to share rendered surfaces, see tile_atlas
+        render_key = self.get_render_key()
+        if render_key != self._content_render_key:
+            self._content_key = self.road_element.get_content_key() if self.road_element else None
+            self._content_render_key = render_key
+        return self._content_key
@@ -0,0 +1,105 @@
+import math
+
+import track_generator.config as config
+from track_generator.profiler import profiler
+
+# pygame is only imported once a tile is rendered, so tracks can be built without a display library
+
+
+def get_lod_scale(scale) -> float:
+    # Smallest power of two that is at least as fine as the requested scale
+    return min(1, 2 ** math.ceil(math.log2(scale)))
+
+
+class TileAtlas:
+    """Rendered tiles of one scale packed into shared surfaces.
+
+    Tiles are stored by their content key, see Tile.get_content_key, so identical tiles share one cell.
+    The least recently used cells are reused once the configured number of pixels is reached.
+    """
+
+    def __init__(self, scale):
+        self.scale = scale
+        self.cell_size = math.ceil(config.tile_size * scale)
+        # Cells per row and column of a page
+        self.page_cells = max(1, config.tile_atlas_page_size // self.cell_size)
+        self.max_cells = max(1, config.tile_atlas_pixels // self.cell_size ** 2)
+        self.pages = []
+        # Content key to (page, area, generation), ordered from least to most recently used
+        self._cells = {}
+        self._cell_count = 0
+        # Incremented for every get_cells call, cells used in the current call are never reused
+        self._generation = 0
+
+    def __repr__(self):
+        return f"Tile atlas for scale {self.scale:g} with {len(self._cells)} cells on {len(self.pages)} pages"
+
+    def __len__(self):
+        return len(self._cells)
+
+    def get_cells(self, tiles) -> list:
+        # (page, area) of every tile, tiles that are not in the atlas yet are drawn
+        self._generation += 1
+        return [self._get_cell(tile) for tile in tiles]
+
+    def _get_cell(self, tile):
+        content_key = tile.get_content_key()
+        cell = self._cells.pop(content_key, None)
+        if cell is None:
+            page, area = self._allocate_cell()
+            with profiler.measure_tile(tile):
+                self._draw_cell(tile, page.subsurface(area))
+        else:
+            page, area, _ = cell
+        self._cells[content_key] = (page, area, self._generation)
+        return page, area
+
+    def _allocate_cell(self):
+        # Reuse the least recently used cell unless it is needed for the current call as well
+        if self._cells and self._cell_count >= self.max_cells:
+            oldest_key = next(iter(self._cells))
+            page, area, generation = self._cells[oldest_key]
+            if generation != self._generation:
+                del self._cells[oldest_key]
+                return page, area
+        import pygame
+        index = self._cell_count
+        self._cell_count += 1
+        cells_per_page = self.page_cells ** 2
+        if index // cells_per_page == len(self.pages):
+            self.pages.append(pygame.Surface((self.page_cells * self.cell_size, self.page_cells * self.cell_size)))
+        index %= cells_per_page
+        area = pygame.Rect((index % self.page_cells) * self.cell_size, (index // self.page_cells) * self.cell_size, self.cell_size, self.cell_size)
+        return self.pages[-1], area
+
+    def _draw_cell(self, tile, surface) -> None:
+        import pygame
+        lod_scale = get_lod_scale(self.scale)
+        if lod_scale == self.scale:
+            tile.draw(surface, self.scale)
+            return
+        # Draw at the next finer power of two and scale down, drawing at arbitrary scales looks jagged
+        lod_page, lod_area = tile_atlases.get(lod_scale).get_cells([tile])[0]
+        pygame.transform.smoothscale(lod_page.subsurface(lod_area), surface.get_size(), surface)
+
+
+class TileAtlasCache:
+    """Texture atlases of the most recently used scales, shared by all tracks."""
+
+    def __init__(self):
+        # Scale to atlas, ordered from least to most recently used
+        self._atlases = {}
+
+    def get(self, scale) -> TileAtlas:
+        atlas = self._atlases.pop(scale, None) or TileAtlas(scale)
+        self._atlases[scale] = atlas
+        # Evict the least recently used scales
+        while len(self._atlases) > config.tile_atlas_cache_size:
+            del self._atlases[next(iter(self._atlases))]
+        return atlas
+
+    def clear(self) -> None:
+        self._atlases.clear()
+
+
+tile_atlases = TileAtlasCache()
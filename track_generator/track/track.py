@@ -1,26 +1,283 @@
-import pygame
+import math
 
 import track_generator.config as config
 from track_generator.track.tile import Tile
+from track_generator.track.chunk import Chunk, get_chunk_position, get_chunk_area
+from track_generator.track.tile_atlas import tile_atlases
+from track_generator.track.track_graph import TrackGraph
+from track_generator.track.edit_history import EditHistory
+from track_generator.track.lane_markings import update_lane_marking_phases
+from track_generator.profiler import profiler
 
 
 class Track:
+    """Tiles of a track on an unbounded grid, stored in a sparse dict of chunks.
+
+    With a pager, chunks that are not needed can be paged out to a file and are loaded again
+    as soon as one of their tiles is accessed, see enable_paging.
+    """
 
     def __init__(self):
-        self.tiles = [] 
+        # Loaded tiles, paged out chunks are not included
+        self.tiles = []
+        # Spatial index from chunk position to chunk, see chunk.get_chunk_position
+        self._chunks = {}
+        # Connectivity of the road elements, kept up to date while tiles are added and points are twinned
+        self.graph = TrackGraph()
+        # Undo and redo of edits, see EditHistory
+        self.history = EditHistory(self)
+        # Road elements whose chain of twins has changed since the lane marking phases were last updated
+        self._lane_marking_changes = {}
+        # Stores the paged out chunks, None if paging is disabled
+        self.pager = None
+        # Rendered chunks by chunk position, ordered from least to most recently used, see _render_chunk
+        self._chunk_surfaces = {}
+        self._chunk_surface_bytes = 0
+
+    def __reduce__(self):
+        # Pickle the flat track file format, twins make the object graph too deep for pickle on long tracks
+        from track_generator.track.serialization import track_from_bytes, track_to_bytes
+        return track_from_bytes, (track_to_bytes(self),)
 
     def add_tile(self, grid_position, road_element=None):
-        self.tiles.append(Tile(grid_position, road_element))
+        if self.get_tile(grid_position) is not None:
+            raise ValueError(f"There already is a tile at grid position {grid_position}")
+        tile = Tile(grid_position)
+        tile.track = self
+        tile.road_element = road_element
+        self.tiles.append(tile)
+        chunk_position = get_chunk_position(tile.grid_position)
+        chunk = self._chunks.get(chunk_position)
+        if chunk is None:
+            chunk = self._chunks[chunk_position] = Chunk(chunk_position)
+        chunk.tiles[tile.grid_position] = tile
+        chunk.revision += 1
+        return tile
+
+    def get_neighbour(self, tile, border):
+        # Tile next to the given one across the border with the given code, see geometry.border_vectors
+        step = ((-1, 0), (0, -1), (1, 0), (0, 1))[border]
+        return self.get_tile((tile.x + step[0], tile.y + step[1]))
+
+    def validate(self) -> list:
+        # Errors of all twinned connection points, only road elements changed since the last call are checked
+        # Twins to paged out chunks are unlinked, so their connection points count as dangling ends
+        errors = self.graph.validate()
+        if self.pager is not None:
+            errors += self.pager.get_errors()
+        return errors
 
     def get_tile(self, grid_position):
-        for tile in self.tiles:
-            if tile.grid_position == grid_position:
-                return tile
-        return None
-
-    def render(self, screen, scale, offset):
-        for tile in self.tiles: 
-            tile_surface = pygame.transform.scale_by(tile.render(), (scale, scale))
-            tile_offset = (config.tile_size * tile.x * scale + offset[0], config.tile_size * tile.y * scale + offset[1])
-            
-            screen.blit(tile_surface, tile_offset)
+        # The chunk of the tile is loaded if it is paged out
+        grid_position = tuple(grid_position)
+        chunk = self._get_chunk(get_chunk_position(grid_position))
+        return chunk.tiles.get(grid_position) if chunk is not None else None
+
+    def get_chunk(self, chunk_position):
+        # Chunk at the position, it is loaded if it is paged out, None if there is no chunk
+        return self._get_chunk(chunk_position)
+
+    def get_chunk_positions(self) -> list:
+        # Positions of the loaded and the paged out chunks
+        return list(self._chunks) + (self.pager.get_chunk_positions() if self.pager is not None else [])
+
+    def get_twin(self, point):
+        # Twin of a connection point, the chunk of the twin is loaded if it is paged out
+        if point.twin is None and self.pager is not None:
+            twin_address = self.pager.get_link(point)
+            if twin_address is not None:
+                # Loading the chunk links the twins again, see ChunkPager.link_twins
+                self.get_tile(twin_address[0])
+        return point.twin
+
+    def get_loaded_tile(self, grid_position):
+        # Like get_tile, but None if the chunk is paged out
+        chunk = self._chunks.get(get_chunk_position(grid_position))
+        return chunk.tiles.get(tuple(grid_position)) if chunk is not None else None
+
+    def get_tile_at_position(self, position):
+        # Position in mm relative to the origin of the track
+        grid_x = math.floor(position[0] / config.tile_size)
+        grid_y = math.floor(position[1] / config.tile_size)
+        return self.get_tile((grid_x, grid_y))
+
+    def get_grid_bounds(self):
+        # Smallest grid area containing all tiles, min inclusive and max exclusive
+        bounds = self.pager.get_grid_bounds() if self.pager is not None else []
+        if self.tiles:
+            bounds.append(((min(tile.x for tile in self.tiles), min(tile.y for tile in self.tiles)),
+                           (max(tile.x for tile in self.tiles) + 1, max(tile.y for tile in self.tiles) + 1)))
+        if not bounds:
+            return (0, 0), (0, 0)
+        min_grid_position = (min(bound[0][0] for bound in bounds), min(bound[0][1] for bound in bounds))
+        max_grid_position = (max(bound[1][0] for bound in bounds), max(bound[1][1] for bound in bounds))
+        return min_grid_position, max_grid_position
+
+    def get_tiles_in_area(self, min_grid_position, max_grid_position):
+        # Tiles in the grid area, min inclusive and max exclusive, paged out chunks in the area are loaded
+        min_x, min_y = min_grid_position
+        max_x, max_y = max_grid_position
+        if max_x <= min_x or max_y <= min_y:
+            return []
+        tiles = []
+        for chunk in self._get_chunks_in_area(min_grid_position, max_grid_position):
+            (chunk_min_x, chunk_min_y), (chunk_max_x, chunk_max_y) = chunk.get_grid_area()
+            if min_x <= chunk_min_x and min_y <= chunk_min_y and chunk_max_x <= max_x and chunk_max_y <= max_y:
+                tiles.extend(chunk.tiles.values())
+            else:
+                tiles.extend(tile for tile in chunk.tiles.values() if min_x <= tile.x < max_x and min_y <= tile.y < max_y)
+        return tiles
+
+    def get_visible_tiles(self, screen_size, scale, offset):
+        return self.get_tiles_in_screen_area((0, 0, *screen_size), scale, offset)
+
+    def get_tiles_in_screen_area(self, area, scale, offset):
+        # Tiles intersecting the (left, top, width, height) pixel area of a screen showing the track at the offset
+        return self.get_tiles_in_area(*self.get_grid_area_on_screen(area, scale, offset))
+
+    def get_grid_area_on_screen(self, area, scale, offset):
+        # Grid area intersecting the pixel area, min inclusive and max exclusive
+        left, top, width, height = area
+        tile_size = config.tile_size * scale
+        min_grid_position = (math.floor((left - offset[0]) / tile_size), math.floor((top - offset[1]) / tile_size))
+        max_grid_position = (math.ceil((left + width - offset[0]) / tile_size), math.ceil((top + height - offset[1]) / tile_size))
+        return min_grid_position, max_grid_position
+
+    def handle_tile_changed(self, tile) -> None:
+        # Called whenever a tile would be drawn differently, invalidates the rendered chunk
+        chunk = self._chunks.get(get_chunk_position(tile.grid_position))
+        if chunk is not None:
+            chunk.revision += 1
+
+    def handle_chain_changed(self, road_element) -> None:
+        # Called whenever the length, the twins or the tile of a road element change
+        # The chains through the road element and its twins get new lane marking phases on the next update
+        self._lane_marking_changes[road_element] = None
+        for point in road_element.connection_points:
+            if point.twin is not None:
+                self._lane_marking_changes[point.twin._road_element] = None
+
+    def enable_paging(self, pager=None) -> None:
+        # Chunks are only paged out by update_paging, by default to a temporary file
+        if self.pager is None:
+            from track_generator.track.chunk_pager import ChunkPager
+            self.pager = pager if pager is not None else ChunkPager()
+
+    def update_paging(self, min_grid_position, max_grid_position, focus_tiles=()) -> None:
+        # Page out all chunks outside of the grid area and the configured margin, except those of the focus tiles
+        # The chunks in the area are loaded on demand, e.g. when they are rendered
+        if self.pager is None:
+            return
+        (min_chunk_x, min_chunk_y), (max_chunk_x, max_chunk_y) = get_chunk_area(min_grid_position, max_grid_position)
+        margin = config.chunk_paging_margin
+        keep = {get_chunk_position(tile.grid_position) for tile in focus_tiles}
+        self.page_out_chunks([position for position, chunk in self._chunks.items() if chunk.tiles and position not in keep
+                              and not (min_chunk_x - margin <= position[0] < max_chunk_x + margin and min_chunk_y - margin <= position[1] < max_chunk_y + margin)])
+
+    def page_out_chunks(self, chunk_positions) -> None:
+        # Write the loaded chunks at the positions to the pager and remove them from the track
+        chunks = [self._chunks[position] for position in chunk_positions if position in self._chunks]
+        if self.pager is None or not chunks:
+            return
+        for chunk in chunks:
+            self.pager.page_out(self, chunk)
+            del self._chunks[chunk.position]
+            self._discard_chunk_surface(chunk.position)
+        self.tiles = [tile for chunk in self._chunks.values() for tile in chunk.tiles.values()]
+
+    def load_all_chunks(self) -> None:
+        if self.pager is not None:
+            for chunk_position in self.pager.get_chunk_positions():
+                self._get_chunk(chunk_position)
+
+    def update_lane_marking_phases(self):
+        # Only the chains of the road elements changed since the last update are walked again
+        # Road elements that were removed or paged out in the meantime are skipped, their twins are marked as well
+        road_elements = [road_element for road_element in self._lane_marking_changes
+                         if road_element.tile is not None and road_element.tile.track is self]
+        self._lane_marking_changes.clear()
+        for road_element in update_lane_marking_phases(road_elements):
+            self.handle_tile_changed(road_element.tile)
+
+    def render(self, screen, scale, offset, area=None):
+        # Only tiles intersecting the pixel area are drawn, by default the whole screen, returns the drawn tiles
+        self.update_lane_marking_phases()
+        if area is None:
+            area = (0, 0, *screen.get_size())
+        chunk_pixels = config.chunk_size * config.tile_size * scale
+        with profiler.measure("track"):
+            if chunk_pixels > config.chunk_surface_max_size:
+                tiles = self.get_tiles_in_screen_area(area, scale, offset)
+                self._render_tiles(screen, tiles, scale, offset)
+                return tiles
+            # Zoomed out far enough to draw whole chunks, which are cached
+            tiles = []
+            for chunk in self._get_chunks_in_area(*self.get_grid_area_on_screen(area, scale, offset)):
+                # Chunks are blitted at whole pixels, the remainder is part of the rendered chunk
+                left, top = chunk.position[0] * chunk_pixels + offset[0], chunk.position[1] * chunk_pixels + offset[1]
+                position = (math.floor(left), math.floor(top))
+                subpixel_offset = (left - position[0], top - position[1])
+                # Only the area of the chunk is blitted, the overhang of its last tiles would cover the next chunk
+                size = (math.floor(left + chunk_pixels) - position[0], math.floor(top + chunk_pixels) - position[1])
+                screen.blit(self._render_chunk(chunk, scale, subpixel_offset), position, (0, 0, *size))
+                tiles.extend(chunk.tiles.values())
+            return tiles
+
+    def _render_tiles(self, surface, tiles, scale, offset) -> None:
+        # Identical tiles share one cell of the atlas, all tiles are drawn in one batch
+        cells = tile_atlases.get(scale).get_cells(tiles)
+        tile_size = config.tile_size * scale
+        surface.blits([(page, (math.floor(tile_size * tile.x + offset[0]), math.floor(tile_size * tile.y + offset[1])), area)
+                       for tile, (page, area) in zip(tiles, cells)], doreturn=False)
+
+    def _render_chunk(self, chunk, scale, subpixel_offset) -> "pygame.Surface":
+        # Rendered chunks are kept until the chunk changes, the least recently used ones are evicted beyond the memory budget
+        # The subpixel offset only changes while zooming, panning moves the view by whole pixels
+        render_key = (scale, chunk.revision, round(subpixel_offset[0], 6), round(subpixel_offset[1], 6))
+        cached = self._discard_chunk_surface(chunk.position)
+        if cached is None or cached[0] != render_key:
+            import pygame
+            chunk_pixels = config.chunk_size * config.tile_size * scale
+            surface = pygame.Surface((math.ceil(chunk_pixels) + 2, math.ceil(chunk_pixels) + 2))
+            surface.fill(config.color_track_background)
+            chunk_offset = (subpixel_offset[0] - chunk.position[0] * chunk_pixels, subpixel_offset[1] - chunk.position[1] * chunk_pixels)
+            self._render_tiles(surface, list(chunk.tiles.values()), scale, chunk_offset)
+            cached = (render_key, surface)
+        self._chunk_surfaces[chunk.position] = cached
+        self._chunk_surface_bytes += _get_surface_bytes(cached[1])
+        while self._chunk_surface_bytes > config.chunk_cache_budget and len(self._chunk_surfaces) > 1:
+            self._discard_chunk_surface(next(iter(self._chunk_surfaces)))
+        return cached[1]
+
+    def _discard_chunk_surface(self, chunk_position):
+        cached = self._chunk_surfaces.pop(chunk_position, None)
+        if cached is not None:
+            self._chunk_surface_bytes -= _get_surface_bytes(cached[1])
+        return cached
+
+    def _get_chunk(self, chunk_position):
+        # Loaded chunk, paged in if necessary, None if there is no chunk at the position
+        chunk = self._chunks.get(chunk_position)
+        if chunk is None and self.pager is not None and chunk_position in self.pager:
+            added_tiles = [self.add_tile(grid_position, road_element) for grid_position, road_element in self.pager.page_in(chunk_position)]
+            # Linking twins again is not an edit
+            with self.history.paused():
+                self.pager.link_twins(self, added_tiles)
+            chunk = self._chunks.get(chunk_position)
+        return chunk
+
+    def _get_chunks_in_area(self, min_grid_position, max_grid_position) -> list:
+        # Loaded and paged out chunks intersecting the grid area, paged out chunks are loaded
+        (min_x, min_y), (max_x, max_y) = get_chunk_area(min_grid_position, max_grid_position)
+        positions = self.get_chunk_positions()
+        # Scan whichever is smaller, the area or the list of chunks
+        if (max_x - min_x) * (max_y - min_y) > len(positions):
+            positions = [position for position in positions if min_x <= position[0] < max_x and min_y <= position[1] < max_y]
+        else:
+            positions = [(x, y) for y in range(min_y, max_y) for x in range(min_x, max_x)]
+        chunks = [self._get_chunk(position) for position in positions]
+        return [chunk for chunk in chunks if chunk is not None]
+
+
+def _get_surface_bytes(surface) -> int:
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
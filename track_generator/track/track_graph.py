@@ -0,0 +1,252 @@
+from track_generator.exceptions import InvalidTrackError
+
+# Grid steps indexed by border code, same order as geometry.border_vectors
+_border_steps = ((-1, 0), (0, -1), (1, 0), (0, 1))  # Left, top, right, bottom
+
+
+class TrackComponent:
+    """Road elements connected through twinned connection points."""
+
+    def __init__(self):
+        self.road_elements = set()
+        # Sum of the lengths of all road elements, up to date after TrackGraph.validate
+        self.length = 0
+        # Results of the last validation, only road elements with errors or dangling ends are listed
+        self._lengths = {}
+        self._errors = {}
+        self._dangling_ends = {}
+        # Road elements that changed since the last validation
+        self._dirty = set()
+
+    def __repr__(self):
+        return f"Track component with {len(self.road_elements)} road elements and {len(self.get_dangling_ends())} dangling ends"
+
+    def __len__(self):
+        return len(self.road_elements)
+
+    def get_errors(self) -> list:
+        return [error for errors in self._errors.values() for error in errors]
+
+    def get_dangling_ends(self) -> list:
+        # Connection points without a twin
+        return [point for points in self._dangling_ends.values() for point in points]
+
+    def is_closed_loop(self) -> bool:
+        # A valid component where every connection point has a twin
+        return not self._errors and not self._dangling_ends
+
+    def _discard_results(self, road_element) -> None:
+        self.length -= self._lengths.pop(road_element, 0)
+        self._errors.pop(road_element, None)
+        self._dangling_ends.pop(road_element, None)
+
+
+class TrackGraph:
+    """Connectivity of the road elements of a track, maintained incrementally.
+
+    Road elements are nodes and mutually twinned connection points are edges. Changes only mark the affected
+    road elements, validate checks them again and only touches their components.
+    """
+
+    def __init__(self):
+        # Component of every road element
+        self._components = {}
+        self._component_set = set()
+        self._dirty_components = set()
+
+    def __len__(self):
+        return len(self._components)
+
+    def __contains__(self, road_element):
+        return road_element in self._components
+
+    def get_component(self, road_element) -> TrackComponent:
+        return self._components.get(road_element)
+
+    def get_components(self) -> list:
+        return list(self._component_set)
+
+    def get_neighbours(self, road_element) -> list:
+        # Road elements twinned with the given one, (connection point, twin) pairs
+        return [(point, point.twin) for point in road_element.connection_points
+                if point.twin is not None and point.twin.twin is point and point.twin._road_element in self._components]
+
+    def add_road_element(self, road_element) -> None:
+        component = TrackComponent()
+        component.road_elements.add(road_element)
+        self._components[road_element] = component
+        self._component_set.add(component)
+        self._mark(road_element)
+        # The road element may already be twinned, e.g. if tiles are added after linking them
+        for _, twin in self.get_neighbours(road_element):
+            self._merge(road_element, twin._road_element)
+
+    def remove_road_element(self, road_element) -> None:
+        component = self._components.pop(road_element, None)
+        if component is None:
+            return
+        component.road_elements.discard(road_element)
+        component._dirty.discard(road_element)
+        component._discard_results(road_element)
+        for _, twin in self.get_neighbours(road_element):
+            self._mark(twin._road_element)
+        self._split(component)
+
+    def handle_twin_changed(self, point, previous_twin) -> None:
+        # Called by ConnectionPoint whenever its twin is set, links are only edges once they are mutual
+        road_element = point._road_element
+        if road_element not in self._components:
+            return
+        self._mark(road_element)
+        if previous_twin is not None and previous_twin._road_element in self._components:
+            self._mark(previous_twin._road_element)
+            if previous_twin.twin is point:
+                self._split(self._components[road_element])
+        twin = point.twin
+        if twin is not None and twin._road_element in self._components:
+            self._mark(twin._road_element)
+            if twin.twin is point:
+                self._merge(road_element, twin._road_element)
+
+    def handle_geometry_changed(self, road_element) -> None:
+        # Called by RoadElement.invalidate, the twins have to be checked again as well
+        if road_element not in self._components:
+            return
+        self._mark(road_element)
+        for point in road_element.connection_points:
+            if point.twin is not None and point.twin._road_element in self._components:
+                self._mark(point.twin._road_element)
+
+    def validate(self) -> list:
+        # Check all changed road elements again and return the errors of the whole track
+        for component in self._dirty_components:
+            for road_element in component._dirty:
+                self._validate_road_element(component, road_element)
+            component._dirty.clear()
+        self._dirty_components.clear()
+        return [error for component in self.get_components() for error in component.get_errors()]
+
+    def get_dangling_ends(self) -> list:
+        self.validate()
+        return [point for component in self.get_components() for point in component.get_dangling_ends()]
+
+    def get_loops(self) -> list:
+        self.validate()
+        return [component for component in self.get_components() if component.is_closed_loop()]
+
+    def get_length(self) -> float:
+        # Total length of all road elements in mm
+        self.validate()
+        return sum(component.length for component in self.get_components())
+
+    def _mark(self, road_element) -> None:
+        component = self._components[road_element]
+        component._dirty.add(road_element)
+        self._dirty_components.add(component)
+
+    def _merge(self, road_element_a, road_element_b) -> None:
+        component_a, component_b = self._components[road_element_a], self._components[road_element_b]
+        if component_a is component_b:
+            return
+        # Move the smaller component, so building a long chain stays linear
+        if len(component_a) < len(component_b):
+            component_a, component_b = component_b, component_a
+        for road_element in component_b.road_elements:
+            self._components[road_element] = component_a
+        component_a.road_elements |= component_b.road_elements
+        component_a.length += component_b.length
+        component_a._lengths.update(component_b._lengths)
+        component_a._errors.update(component_b._errors)
+        component_a._dangling_ends.update(component_b._dangling_ends)
+        component_a._dirty |= component_b._dirty
+        self._component_set.discard(component_b)
+        self._dirty_components.discard(component_b)
+        if component_a._dirty:
+            self._dirty_components.add(component_a)
+
+    def _split(self, component) -> None:
+        # Search the parts that are still connected, only the road elements of this component are visited
+        remaining = set(component.road_elements)
+        if not remaining:
+            self._component_set.discard(component)
+            self._dirty_components.discard(component)
+            return
+        parts = []
+        while remaining:
+            start = remaining.pop()
+            part = {start}
+            queue = [start]
+            while queue:
+                for _, twin in self.get_neighbours(queue.pop()):
+                    neighbour = twin._road_element
+                    if neighbour in remaining:
+                        remaining.discard(neighbour)
+                        part.add(neighbour)
+                        queue.append(neighbour)
+            parts.append(part)
+        if len(parts) == 1:
+            return
+        # The largest part keeps the component, the others get new ones
+        parts.sort(key=len, reverse=True)
+        for part in parts[1:]:
+            new_component = TrackComponent()
+            self._component_set.add(new_component)
+            for road_element in part:
+                self._components[road_element] = new_component
+                new_component.road_elements.add(road_element)
+                length = component._lengths.get(road_element)
+                if length is not None:
+                    new_component._lengths[road_element] = length
+                    new_component.length += length
+                for source, target in ((component._errors, new_component._errors), (component._dangling_ends, new_component._dangling_ends)):
+                    if road_element in source:
+                        target[road_element] = source[road_element]
+                if road_element in component._dirty:
+                    new_component._dirty.add(road_element)
+                component.road_elements.discard(road_element)
+                component._dirty.discard(road_element)
+                component._discard_results(road_element)
+            if new_component._dirty:
+                self._dirty_components.add(new_component)
+        if not component._dirty:
+            self._dirty_components.discard(component)
+
+    def _validate_road_element(self, component, road_element) -> None:
+        component._discard_results(road_element)
+        length = road_element.get_length()
+        component._lengths[road_element] = length
+        component.length += length
+        errors, dangling_ends = [], []
+        for point in road_element.connection_points:
+            if point.twin is None:
+                dangling_ends.append(point)
+                continue
+            error = _check_twins(road_element, point, point.twin)
+            if error:
+                errors.append(InvalidTrackError(error, point))
+        if errors:
+            component._errors[road_element] = errors
+        if dangling_ends:
+            component._dangling_ends[road_element] = dangling_ends
+
+
+def _check_twins(road_element, point, twin) -> str:
+    # Same rules as serialization._validate_twins, returns a description of the first violated rule
+    if twin.twin is not point:
+        return "Twin of the connection point is linked to another point"
+    tile, twin_tile = road_element.tile, twin._road_element.tile
+    if tile is None or twin_tile is None:
+        return "Twin of the connection point is not part of the track"
+    border = point.get_border_code()
+    step = _border_steps[border]
+    if twin_tile.grid_position != (tile.x + step[0], tile.y + step[1]):
+        return "Twin of the connection point is not on the adjacent tile"
+    if twin.get_border_code() != (border + 2) % 4:
+        return "Twinned connection points are not on opposite borders"
+    if not _is_close(point.get_mirrored_position(), twin.position) or not _is_close(point.direction, -twin.direction):
+        return "Twinned connection points do not match"
+    return None
+
+
+def _is_close(vector_a, vector_b, tolerance=1e-6) -> bool:
+    return abs(vector_a[0] - vector_b[0]) <= tolerance and abs(vector_a[1] - vector_b[1]) <= tolerance
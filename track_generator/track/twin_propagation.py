@@ -0,0 +1,46 @@
+from collections import deque
+
+from track_generator.track.points import mirror_position
+from track_generator.track.point_store import point_store
+from track_generator.exceptions import InvalidPositionError
+
+
+def propagate_update(road_element, state) -> list:
+    # Walk the twins with a worklist and solve the new geometry of every reached road element first
+    # Nothing is changed unless all of them could be solved, so an invalid position leaves the track untouched
+    # Returns the affected road elements
+    states = {road_element: state}
+    # Connection point every solved road element was reached through, its twin agrees by construction
+    entry_points = {}
+    worklist = deque([road_element])
+    positions, directions = point_store.positions, point_store.directions
+    while worklist:
+        current = worklist.popleft()
+        for point, (position, direction, border) in zip(current.connection_points, states[current].connection_points):
+            twin = point.twin
+            if twin is None or entry_points.get(current) is point:
+                continue
+            twin_element = twin._road_element
+            if twin_element in states:
+                # Closed loops reach solved road elements again from the other side, their twins have to agree
+                twin_position, twin_direction, _ = states[twin_element].connection_points[twin._get_index()]
+                if not _is_close(mirror_position(position, border), twin_position) or not _is_close(direction, -twin_direction):
+                    raise InvalidPositionError("Twinned connection points do not match after moving the loop", twin_position, twin)
+                continue
+            # Twins of points that did not move are already consistent, the coordinates are read from the store directly
+            slot = point._slot
+            if (position[0] == positions.item(slot, 0) and position[1] == positions.item(slot, 1)
+                    and direction[0] == directions.item(slot, 0) and direction[1] == directions.item(slot, 1)):
+                continue
+            states[twin_element] = twin_element.solve_connection_point(twin._get_index(), mirror_position(position, border), -direction)
+            entry_points[twin_element] = twin
+            worklist.append(twin_element)
+    
+    for affected_element, affected_state in states.items():
+        affected_element.set_state(affected_state)
+    return list(states)
+
+
+def _is_close(vector_a, vector_b, tolerance=1e-6) -> bool:
+    # Positions are rounded to mm, directions are normalized floats
+    return abs(vector_a[0] - vector_b[0]) <= tolerance and abs(vector_a[1] - vector_b[1]) <= tolerance
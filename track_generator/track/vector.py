@@ -0,0 +1,104 @@
+import math
+import numbers
+
+
+class Vector2:
+    # Minimal 2D vector for the track model, so tracks can be built without loading pygame
+    # Behaves like pygame.Vector2 for the operations used here and can be passed to pygame directly
+
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x=0, y=None):
+        if y is None:
+            if type(x) is Vector2:
+                self.x, self.y = x.x, x.y
+                return
+            x, y = x
+        self.x = float(x)
+        self.y = float(y)
+
+    def __repr__(self):
+        return f"Vector2({self.x:g}, {self.y:g})"
+
+    def __str__(self):
+        return f"[{self.x:g}, {self.y:g}]"
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index):
+        if index == 0:
+            return self.x
+        if index == 1:
+            return self.y
+        return (self.x, self.y)[index]
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __eq__(self, other):
+        try:
+            return len(other) == 2 and self.x == other[0] and self.y == other[1]
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    # Mutable like pygame.Vector2
+    __hash__ = None
+
+    def __bool__(self):
+        return self.x != 0 or self.y != 0
+
+    def __neg__(self):
+        return from_floats(-self.x, -self.y)
+
+    def __add__(self, other):
+        return from_floats(self.x + other[0], self.y + other[1])
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return from_floats(self.x - other[0], self.y - other[1])
+
+    def __rsub__(self, other):
+        return from_floats(other[0] - self.x, other[1] - self.y)
+
+    def __mul__(self, scalar):
+        if not isinstance(scalar, numbers.Real):
+            return NotImplemented
+        return from_floats(self.x * scalar, self.y * scalar)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scalar):
+        return from_floats(self.x / scalar, self.y / scalar)
+
+    def copy(self):
+        return from_floats(self.x, self.y)
+
+    def length(self):
+        return math.hypot(self.x, self.y)
+
+    def normalize(self):
+        length = math.hypot(self.x, self.y)
+        if length == 0:
+            raise ValueError("Can't normalize Vector of length Zero")
+        return from_floats(self.x / length, self.y / length)
+
+    def dot(self, other):
+        return self.x * other[0] + self.y * other[1]
+
+    def distance_to(self, other):
+        return math.hypot(self.x - other[0], self.y - other[1])
+
+
+def from_floats(x, y) -> Vector2:
+    # Vector2 without the conversions of the constructor, for values that are floats already, e.g. from the point store
+    vector = object.__new__(Vector2)
+    vector.x = x
+    vector.y = y
+    return vector
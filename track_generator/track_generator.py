@@ -4,6 +4,7 @@ import track_generator.config as config
 from track_generator.track.track import Track
 from track_generator.user_interface.user_interface import UserInterface
 from track_generator.track.tile import Tile
+from track_generator.profiler import profiler
 
 
 class TrackGenerator:
@@ -44,13 +45,38 @@ class TrackGenerator:
         self.track.add_tile(grid_position, road_element)
                     
     def _update(self) -> None:
-        self._handle_events()
+        events = self._get_events()
+        # Waiting for events is not part of the profiled frame
+        profiler.begin_frame()
+        with profiler.measure("events"):
+            self._handle_events(events)
         self.user_interface.render()
+        profiler.end_frame()
 
-    def _handle_events(self) -> None:
-        for event in pygame.event.get():
+    def _get_events(self) -> list:
+        if config.redraw_on_demand and not self.user_interface.needs_redraw:
+            # Nothing to redraw, sleep until the next event arrives
+            return [pygame.event.wait(config.idle_event_timeout)] + pygame.event.get()
+        return pygame.event.get()
+
+    def _handle_events(self, events) -> None:
+        for event in coalesce_mouse_motion(events):
             self.user_interface.handle_user_inputs(event)
             if event.type == pygame.QUIT:
                 self.running = False
 
-    
+
+def coalesce_mouse_motion(events) -> list:
+    # Merge consecutive motion events into one with the latest position and the summed relative motion
+    # Runs are split at any other event or a change of the pressed buttons, so presses and pans are kept
+    coalesced = []
+    for event in events:
+        previous = coalesced[-1] if coalesced else None
+        if (event.type == pygame.MOUSEMOTION and previous is not None and previous.type == pygame.MOUSEMOTION
+                and previous.buttons == event.buttons):
+            attributes = dict(event.dict)
+            attributes["rel"] = (previous.rel[0] + event.rel[0], previous.rel[1] + event.rel[1])
+            coalesced[-1] = pygame.event.Event(pygame.MOUSEMOTION, attributes)
+        else:
+            coalesced.append(event)
+    return coalesced
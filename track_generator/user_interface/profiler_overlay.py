@@ -0,0 +1,68 @@
+import pygame
+
+import track_generator.config as config
+from track_generator.profiler import Profiler
+
+# Colors of the phases in the frame time graph, time outside of all phases is drawn as "other"
+phase_colors = {
+    "events": (230, 160, 40),
+    "geometry": (220, 60, 60),
+    "tiles": (60, 200, 90),
+    "track": (60, 140, 230),
+    "status": (170, 90, 210),
+    "overlay": (230, 230, 80),
+    "flip": (90, 210, 210),
+    "wait": (110, 110, 130),
+    "other": (170, 170, 170),
+}
+
+
+class ProfilerOverlay:
+    """Frame time graph split by phase, average phase times and the slowest tile draws."""
+
+    def __init__(self, profiler: Profiler, font):
+        self.profiler = profiler
+        self.font = font
+
+    def render(self, screen: pygame.Surface, position) -> None:
+        width, height = config.profiler_graph_size
+        line_height = self.font.get_linesize()
+        lines = self._get_lines()
+        panel = pygame.Surface((width, height + line_height * len(lines)), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 180))
+        self._render_graph(panel, width, height)
+        for index, (text, color) in enumerate(lines):
+            panel.blit(self.font.render(text, True, color), (4, height + index * line_height))
+        screen.blit(panel, position)
+
+    def _render_graph(self, panel, width, height) -> None:
+        # One column per frame, newest on the right, phases stacked from the bottom
+        pixels_per_second = height / (config.profiler_graph_max_time / 1000)
+        column_width = max(1, width // config.profiler_history_size)
+        frames = list(self.profiler.frames)[-(width // column_width):]
+        for index, frame in enumerate(frames):
+            left = width - (len(frames) - index) * column_width
+            bottom = height
+            for phase, seconds in [*frame.phases.items(), ("other", frame.get_other_time())]:
+                bar_height = round(seconds * pixels_per_second)
+                if bar_height <= 0:
+                    continue
+                color = phase_colors.get(phase, phase_colors["other"])
+                pygame.draw.rect(panel, color, (left, bottom - bar_height, column_width, bar_height))
+                bottom -= bar_height
+        # Reference line at 60 FPS
+        target = height - round(pixels_per_second / 60)
+        if target > 0:
+            pygame.draw.line(panel, (255, 255, 255), (0, target), (width, target))
+
+    def _get_lines(self) -> list:
+        frames = self.profiler.frames
+        duration = sum(frame.duration for frame in frames) / len(frames) if frames else 0
+        trace = "   Tracing to " + config.profiler_trace_path if self.profiler.is_tracing else ""
+        lines = [(f"Frame {duration * 1000:.2f} ms{trace}", (255, 255, 255))]
+        average_times = self.profiler.get_average_times()
+        lines.extend((f"{phase}: {seconds * 1000:.2f} ms", phase_colors.get(phase, phase_colors["other"]))
+                     for phase, seconds in sorted(average_times.items(), key=lambda item: item[1], reverse=True))
+        for grid_position, seconds in self.profiler.get_slowest_tiles(config.profiler_slowest_tiles):
+            lines.append((f"Tile {grid_position}: {seconds * 1000:.2f} ms", (200, 200, 200)))
+        return lines
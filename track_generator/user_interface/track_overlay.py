@@ -5,7 +5,6 @@ import track_generator.config as config
 
 from track_generator.track.track import Track
 from track_generator.track.points import ConnectionPoint, GuidePoint
-from pip._vendor.pygments.lexer import include
 
 
 class TrackOverlay:
@@ -20,6 +19,8 @@ class TrackOverlay:
         self.selected_point = None
         self.selected_point_index = None
         self.point_is_dragging = False
+        # Latest drag position, the point is only moved once per frame, see apply_drag
+        self._drag_position = None
         
     def render(self):
         # Highlight the tile the mouse is hovering over
@@ -36,6 +37,8 @@ class TrackOverlay:
 
     def handle_mouse_press(self, event, position):
         if event.button == pygame.BUTTON_LEFT:
+            # The release of a previous drag may have been missed
+            self.end_drag()
             # Check if a point was clicked and select it
             if self.selected_tile and self.selected_tile.road_element:
                 cp = enumerate(self.selected_tile.road_element.connection_points)
@@ -48,37 +51,52 @@ class TrackOverlay:
                             self.selected_point = point
                             self.selected_point_index = index
                             self.point_is_dragging = True
+                            # All moves of the drag become one undo step
+                            self.track.history.begin_group()
                             return
             
             # Click on a tile to select/deselect it
-            for tile in self.track.tiles:
-                if self._get_tile_rect_on_screen(tile).collidepoint(position):
-                    # Toggle tile selection
-                    self.selected_tile = tile if self.selected_tile != tile else None
-                    break
+            tile = self._get_tile_at_screen_position(position)
+            if tile:
+                # Toggle tile selection
+                self.selected_tile = tile if self.selected_tile != tile else None
             else:
                 self.selected_tile = None
         
     def handle_mouse_release(self, event, position):
         if event.button == pygame.BUTTON_LEFT:
-            self.point_is_dragging = False
-            self.selected_point = None
+            try:
+                # The point ends up at the last position even if no frame was rendered in between
+                self.apply_drag()
+            finally:
+                self.end_drag()
+
+    def end_drag(self):
+        # Also called when the window loses the focus, the release of the mouse button is not reported then
+        if self.point_is_dragging:
+            self.track.history.end_group()
+        self.point_is_dragging = False
+        self.selected_point = None
+        self._drag_position = None
         
     def handle_mouse_motion(self, position):
-        # Update the position of the selected point if it is being dragged
+        # Remember the position of the selected point if it is being dragged
         if self.point_is_dragging:
-            tile_position = self._screen_position_to_tile_position(position, self.selected_tile)
-            if isinstance(self.selected_point, GuidePoint):
-                self.selected_tile.road_element.update_guide_point(self.selected_point_index, tile_position)
-            elif isinstance(self.selected_point, ConnectionPoint):
-                self.selected_tile.road_element.update_connection_point(self.selected_point_index, tile_position)
+            self._drag_position = position
         else:
             # Update the tile the mouse is hovering over
-            self.higlighted_tile = None
-            for tile in self.track.tiles:
-                if self._get_tile_rect_on_screen(tile).collidepoint(position):
-                    self.higlighted_tile = tile
-                    break
+            self.higlighted_tile = self._get_tile_at_screen_position(position)
+        
+    def apply_drag(self):
+        # Move the dragged point to the latest position, solving the track geometry is too expensive for every motion event
+        if self._drag_position is None or not self.point_is_dragging:
+            return
+        position, self._drag_position = self._drag_position, None
+        tile_position = self._screen_position_to_tile_position(position, self.selected_tile)
+        if isinstance(self.selected_point, GuidePoint):
+            self.selected_tile.road_element.update_guide_point(self.selected_point_index, tile_position)
+        elif isinstance(self.selected_point, ConnectionPoint):
+            self.selected_tile.road_element.update_connection_point(self.selected_point_index, tile_position)
         
     def handle_mouse_wheel(self, event):
         self.ui.track_scale = self.ui.track_scale * (1 + event.y * 0.1)
@@ -135,6 +153,11 @@ class TrackOverlay:
         tile_y = (screen_position[1] - self.ui.track_offset[1]) / self.ui.track_scale - tile.grid_position[1] * config.tile_size
         return pygame.Vector2(tile_x, tile_y)
     
+    def _get_tile_at_screen_position(self, screen_position):
+        track_x = (screen_position[0] - self.ui.track_offset[0]) / self.ui.track_scale
+        track_y = (screen_position[1] - self.ui.track_offset[1]) / self.ui.track_scale
+        return self.track.get_tile_at_position((track_x, track_y))
+    
     def _get_tile_rect_on_screen(self, tile):
         x, y = self._tile_position_to_screen_position((0, 0), tile)
         width = config.tile_size * self.ui.track_scale
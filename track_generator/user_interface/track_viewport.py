@@ -0,0 +1,94 @@
+import pygame
+
+import track_generator.config as config
+from track_generator.track.track import Track
+
+
+class TrackViewport:
+    """Track rendered to a surface that is kept between frames.
+
+    Panning scrolls the pixels of the previous frame and only draws the exposed strips.
+    Otherwise only tiles that changed since they were drawn are redrawn.
+    """
+
+    def __init__(self, track: Track):
+        self.track = track
+        self.surface = None
+        self._scale = None
+        self._offset = None
+        # Render key of every grid position at the time its tile was drawn, see Tile.get_render_key
+        self._render_keys = {}
+
+    def invalidate(self) -> None:
+        # Draw everything again in the next frame
+        self._scale = None
+
+    def render(self, size, scale, offset) -> pygame.Surface:
+        self.track.update_lane_marking_phases()
+        if self.surface is None or self.surface.get_size() != tuple(size):
+            self.surface = pygame.Surface(size)
+            self._scale = None
+
+        shift = self._get_shift(scale, offset)
+        if shift is None:
+            self._render_keys.clear()
+            self._record_render_keys(self._render_area(self.surface.get_rect(), scale, offset))
+        else:
+            if shift != (0, 0):
+                self.surface.scroll(*shift)
+            # Tiles that changed are drawn completely, including the part that was scrolled
+            # Neighbours overlapping the tile rect are only drawn partially, so only the changed tile is up to date
+            changed_tiles = [tile for tile in self.track.get_visible_tiles(size, scale, offset) if self._render_keys.get(tile.grid_position) != tile.get_render_key()]
+            for tile in changed_tiles:
+                self._render_area(self._get_tile_rect(tile, scale, offset).clip(self.surface.get_rect()), scale, offset)
+            self._record_render_keys(changed_tiles)
+            # All tiles already on the surface are up to date now, the rest of tiles in the exposed strips was not visible
+            for area in self._get_exposed_areas(shift):
+                self._record_render_keys(self._render_area(area, scale, offset))
+        self._scale = scale
+        self._offset = tuple(offset)
+        return self.surface
+
+    def _get_shift(self, scale, offset):
+        # Pixels the previous frame has to be scrolled by, None if it can not be reused
+        if self._scale != scale:
+            return None
+        dx, dy = offset[0] - self._offset[0], offset[1] - self._offset[1]
+        width, height = self.surface.get_size()
+        # Only whole pixel shifts keep the tiles at the same positions as a full redraw
+        if dx != int(dx) or dy != int(dy) or abs(dx) >= width or abs(dy) >= height:
+            return None
+        return int(dx), int(dy)
+
+    def _get_exposed_areas(self, shift) -> list:
+        # Strips of the surface that were scrolled in from outside
+        dx, dy = shift
+        width, height = self.surface.get_size()
+        areas = []
+        if dx > 0:
+            areas.append(pygame.Rect(0, 0, dx, height))
+        elif dx < 0:
+            areas.append(pygame.Rect(width + dx, 0, -dx, height))
+        if dy > 0:
+            areas.append(pygame.Rect(0, 0, width, dy))
+        elif dy < 0:
+            areas.append(pygame.Rect(0, height + dy, width, -dy))
+        return areas
+
+    def _get_tile_rect(self, tile, scale, offset) -> pygame.Rect:
+        tile_size = config.tile_size * scale
+        return pygame.Rect(int(tile.x * tile_size + offset[0]), int(tile.y * tile_size + offset[1]), int(tile_size) + 2, int(tile_size) + 2)
+
+    def _render_area(self, area, scale, offset) -> list:
+        # Returns the tiles that were drawn
+        if area.width <= 0 or area.height <= 0:
+            return []
+        self.surface.set_clip(area)
+        self.surface.fill(config.color_track_background, area)
+        tiles = self.track.render(self.surface, scale, offset, area)
+        self.surface.set_clip(None)
+        return tiles
+
+    def _record_render_keys(self, tiles) -> None:
+        for tile in tiles:
+            self._render_keys[tile.grid_position] = tile.get_render_key()
@@ -3,7 +3,10 @@ import os
 
 import track_generator.config as config
 from track_generator.user_interface.track_overlay import TrackOverlay
-from track_generator.exceptions import InvalidTrackError
+from track_generator.user_interface.track_viewport import TrackViewport
+from track_generator.user_interface.profiler_overlay import ProfilerOverlay
+from track_generator.profiler import profiler
+from track_generator.exceptions import InvalidTrackError, InvalidPositionError
 
 # fonts folder in file directory
 font_file_path = os.path.join(os.path.dirname(__file__), "fonts", "Rajdhani-SemiBold.ttf")
@@ -18,25 +21,60 @@ class UserInterface:
                 
         self.track_screen =  None
         self.track_overlay = TrackOverlay(self, self.track_screen, track)
+        # Track without the overlay, kept between frames to scroll it while panning
+        self.track_viewport = TrackViewport(track)
         self.track_scale = config.track_default_scale
         self.track_offset = config.track_default_offset
+        # Chunks far from the view are paged out to a file, see _update_paging
+        if config.chunk_paging:
+            track.enable_paging()
+        
+        # Set whenever input or track changes invalidate the view
+        self.needs_redraw = True
         
         self._fps_counter = 0
         self._fps_sum = 0
         self._fps = 0
         
+        # Fonts by size and pre-rendered text, see _update_layout
+        self._fonts = {}
+        self._top_bar_surface = None
+        self._fps_surface = None
+        self._fps_text = None
+        self._status_surface = None
+        self._status_text = None
+        
         self._update_layout()
+        self.profiler_overlay = ProfilerOverlay(profiler, self._get_font(config.ui_top_bar_height // 5))
 
 
     def render(self) -> None:
-        self.clock.tick()
+        if config.redraw_on_demand and not self.needs_redraw:
+            return
+        with profiler.measure("wait"):
+            self.clock.tick(config.fps_limit)
+        try:
+            self.track_overlay.apply_drag()
+        except (InvalidTrackError, InvalidPositionError) as e:
+            self._handle_track_error(e)
         self.screen.fill(config.color_background)
         self._render_top_bar()
         self._render_track_screen()
+        if profiler.enabled:
+            self.profiler_overlay.render(self.screen, (config.ui_track_padding, self.top_bar_height + config.ui_track_padding))
         
-        pygame.display.flip()
+        with profiler.measure("flip"):
+            pygame.display.flip()
+        # Keep drawing while profiling, so the graph shows the cost of a frame
+        self.needs_redraw = profiler.enabled
+        
+    def invalidate(self) -> None:
+        self.needs_redraw = True
         
     def handle_user_inputs(self, event) -> None:
+        # Mouse motion only invalidates the view if it changes something, see _handle_mouse_motion
+        if event.type not in (pygame.MOUSEMOTION, pygame.NOEVENT):
+            self.invalidate()
         try:
             if event.type == pygame.KEYDOWN:
                 self._handle_keydown(event)
@@ -50,7 +88,9 @@ class UserInterface:
                 self._handle_mouse_wheel(event)
             elif event.type == pygame.VIDEORESIZE:
                 self._update_layout()
-        except InvalidTrackError as e:
+            elif event.type == pygame.WINDOWFOCUSLOST:
+                self.track_overlay.end_drag()
+        except (InvalidTrackError, InvalidPositionError) as e:
             self._handle_track_error(e)
             
     def _handle_track_error(self, error: Exception) -> None:            
@@ -72,28 +112,52 @@ class UserInterface:
         self.track_screen = pygame.Surface((track_screen_width, track_screen_height))
         self.track_overlay.set_screen(self.track_screen)
         
+        # The top bar is static and only has to be rebuilt when the window size changes
+        self._top_bar_surface = self._create_top_bar()
+        
     
     def _render_track_screen(self) -> None:
-        # Fill the track screen with the background color
-        self.track_screen.fill(config.color_track_background)
-        # Render the track
-        self.track.render(self.track_screen, self.track_scale, self.track_offset) 
+        # Render the track, only tiles that changed or were panned into view are drawn again
+        self._update_paging()
+        track_surface = self.track_viewport.render(self.track_screen.get_size(), self.track_scale, self.track_offset)
+        self.track_screen.blit(track_surface, (0, 0))
         # Render the track overlay
-        self.track_overlay.render()
+        with profiler.measure("overlay"):
+            self.track_overlay.render()
         # Blit the track screen to the main screen  
         self.screen.blit(self.track_screen, (config.ui_track_padding, self.top_bar_height + config.ui_track_padding))            
         
-    def _render_top_bar(self) -> None:
+    def _update_paging(self) -> None:
+        # Keep the visible chunks and those of the tiles the overlay refers to loaded
+        if self.track.pager is None:
+            return
+        area = self.track.get_grid_area_on_screen((0, 0, *self.track_screen.get_size()), self.track_scale, self.track_offset)
+        focus_tiles = [tile for tile in (self.track_overlay.selected_tile, self.track_overlay.higlighted_tile) if tile is not None]
+        self.track.update_paging(*area, focus_tiles)
+
+    def _get_font(self, size) -> pygame.font.Font:
+        if size not in self._fonts:
+            self._fonts[size] = pygame.font.Font(font_file_path, size)
+        return self._fonts[size]
+        
+    def _create_top_bar(self) -> pygame.Surface:
         padding = config.ui_track_padding
         top_bar_surface = pygame.Surface((self.screen_width - 2 * padding, config.ui_top_bar_height))
         text = f"CAuDri-Challenge Track Generator"
-        font = pygame.font.Font(font_file_path, config.ui_top_bar_height // 2)
+        font = self._get_font(config.ui_top_bar_height // 2)
         text_surface = font.render(text, True, (10, 10, 10))
         text_rect = text_surface.get_rect(center=(top_bar_surface.get_width() // 2, top_bar_surface.get_height() // 2))
         top_bar_surface.fill(config.color_background)
         top_bar_surface.blit(text_surface, text_rect)
-        top_bar_surface.blit(self._render_fps(), (self.screen_width - padding - 100, 0))
-        self.screen.blit(top_bar_surface, (padding, 0))
+        return top_bar_surface
+        
+    def _render_top_bar(self) -> None:
+        padding = config.ui_track_padding
+        self.screen.blit(self._top_bar_surface, (padding, 0))
+        self.screen.blit(self._render_fps(), (self.screen_width - 100, 0))
+        with profiler.measure("status"):
+            status_surface = self._render_track_status()
+        self.screen.blit(status_surface, (padding, config.ui_top_bar_height - status_surface.get_height()))
         
     def _render_fps(self) -> pygame.Surface:
         # Average FPS over the last 50 frames
@@ -104,10 +168,31 @@ class UserInterface:
             self._fps = self._fps_sum / 50
             self._fps_sum = 0
 
-        font = pygame.font.Font(font_file_path, config.ui_top_bar_height // 5)
-        text_surface = font.render(f"FPS: {self._fps:.0f}", True, (200, 200, 200))
-        return text_surface
+        # Only render the label again if the displayed value changed
+        text = f"FPS: {self._fps:.0f}"
+        if text != self._fps_text:
+            font = self._get_font(config.ui_top_bar_height // 5)
+            self._fps_surface = font.render(text, True, (200, 200, 200))
+            self._fps_text = text
+        return self._fps_surface
         
+    def _render_track_status(self) -> pygame.Surface:
+        # Validation only checks road elements changed since the last frame, so it can run every frame
+        graph = self.track.graph
+        errors = self.track.validate()
+        # Only loaded chunks are validated, connection points twinned with paged out chunks are not open
+        dangling_ends = graph.get_dangling_ends()
+        if self.track.pager is not None:
+            dangling_ends = [point for point in dangling_ends if not self.track.pager.is_unlinked(point)]
+        text = f"Loops: {len(graph.get_loops())}   Open ends: {len(dangling_ends)}   Errors: {len(errors)}   Length: {graph.get_length() / 1000:.1f} m"
+        if self.track.pager is not None:
+            text += f"   Paged out chunks: {len(self.track.pager)}"
+        if text != self._status_text:
+            font = self._get_font(config.ui_top_bar_height // 5)
+            self._status_surface = font.render(text, True, (200, 200, 200))
+            self._status_text = text
+        return self._status_surface
+
     def _screen_to_track_position(self, screen_position) -> tuple:
         return (
             (screen_position[0] - self.track_screen_rect.left),
@@ -118,10 +203,26 @@ class UserInterface:
         new_pos_x = self.track_offset[0] + dx
         new_pos_y = self.track_offset[1] + dy
         self.track_offset = [new_pos_x, new_pos_y]
+        self.invalidate()
 
     def _handle_keydown(self, event: pygame.event.Event) -> None:
         if event.key == pygame.K_ESCAPE:
             pygame.quit()
+        elif event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+            if event.mod & pygame.KMOD_SHIFT:
+                self.track.history.redo()
+            else:
+                self.track.history.undo()
+        elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+            self.track.history.redo()
+        elif event.key == pygame.K_F3:
+            profiler.set_enabled(not profiler.enabled)
+        elif event.key == pygame.K_F4 and profiler.enabled:
+            # Dump the frames to a file for offline analysis, see Profiler.start_trace
+            if profiler.is_tracing:
+                profiler.stop_trace()
+            else:
+                profiler.start_trace(config.profiler_trace_path)
             
     def _handle_mouse_press(self, event) -> None:
         if self.track_screen_rect.collidepoint(event.pos):
@@ -136,7 +237,10 @@ class UserInterface:
             if event.buttons[1]:
                 dx, dy = event.rel
                 self._move_track(dx, dy)
+        highlighted_tile = self.track_overlay.higlighted_tile
         self.track_overlay.handle_mouse_motion(self._screen_to_track_position(event.pos))
+        if self.track_overlay.point_is_dragging or self.track_overlay.higlighted_tile is not highlighted_tile:
+            self.invalidate()
 
     def _handle_mouse_wheel(self, event: pygame.event.Event) -> None:
         mouse_pos = pygame.mouse.get_pos()